@@ -0,0 +1,283 @@
+"""
+Asyncio serving mode of the ERP integration API, built on aiohttp.
+
+Serves the same /api/products and /api/technicians/nearest contract and status codes
+as the Flask app in main.py, but calls the legacy ERP with a non-blocking client, so a
+single process keeps thousands of requests in flight while it waits on the ERP.
+
+Usage:
+    python api_rest/async_main.py --port 3000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+
+if __package__ in (None, ""):
+    # Run as a script: make the api_rest package importable
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from api_rest.erp_client import (
+    ERP_BASE_URL, ERP_CONNECT_TIMEOUT, ERP_READ_TIMEOUT, ERP_RETRIES, ERP_RETRY_BACKOFF, RETRY_STATUSES
+)
+from api_rest.geo import NearestTechnicians
+from api_rest.metrics import METRICS_CONTENT_TYPE, UNMATCHED_ROUTE, registry
+from api_rest.technicians import (
+    ROSTER_CHUNK_SIZE, STREAM_TECHNICIANS, parse_technician_query, technician_indexes, technician_metrics
+)
+from data_transformation.streaming import JsonArrayDecoder
+
+# Upstream connections are cheap without a thread each, so the async pool is larger
+ERP_ASYNC_POOL_SIZE = int(os.environ.get("ERP_ASYNC_POOL_SIZE", 512))
+
+
+class ErpResponse:
+    """A fully read ERP response, with the parts of requests.Response the handlers use."""
+    __slots__ = ("status_code", "content")
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncErpClient:
+    """
+    Non-blocking counterpart of ErpClient: pooled keep-alive connections, connect and
+    read timeouts, and the same retries on connection errors and transient statuses.
+    The aiohttp session is opened on first use, inside the running event loop.
+    """
+
+    def __init__(self, base_url=ERP_BASE_URL, pool_size=ERP_ASYNC_POOL_SIZE, connect_timeout=ERP_CONNECT_TIMEOUT,
+                 read_timeout=ERP_READ_TIMEOUT, retries=ERP_RETRIES, backoff=ERP_RETRY_BACKOFF, metrics=registry):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.metrics = metrics
+        self.session = None
+
+    async def get(self, path):
+        """
+        Sends a GET request to the ERP.
+
+        Args:
+            path: Path below the base URL, e.g. "/parts/1"
+
+        Returns:
+            The ErpResponse, whatever its status code
+        """
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await self._get(path)
+            status = response.status_code
+            return response
+        finally:
+            if self.metrics is not None:
+                self.metrics.observe_erp_call(path, status, time.perf_counter() - start)
+
+    async def _get(self, path):
+        session = self._session()
+        for attempt in range(self.retries + 1):
+            try:
+                async with session.get(f"{self.base_url}{path}") as response:
+                    content = await response.read()
+                    if response.status not in RETRY_STATUSES or attempt == self.retries:
+                        return ErpResponse(response.status, content)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+            # Same schedule as urllib3: retry straight away, then back off exponentially
+            if attempt:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    def stream(self, path):
+        """
+        Sends a GET request to the ERP without reading the body, for iterating over
+        response.content. Use the response as an async context manager.
+        """
+        return self._session().get(f"{self.base_url}{path}")
+
+    def _session(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size), timeout=self.timeout
+            )
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+
+ERP = web.AppKey("erp", AsyncErpClient)
+
+# The ERP is called directly, without the Flask app's cache and circuit breakers, so
+# only the technician index has counters to export
+registry.add_collector(technician_metrics)
+
+
+def error(message, status):
+    return web.json_response({"error": message}, status=status)
+
+
+# Retrieve product details from the legacy ERP
+async def get_product(request):
+    """
+    Endpoint to fetch information about a specific product.
+    Parameters:
+        part_id: ID of the part to be queried
+    Returns:
+        JSON containing product details including id, type, stock, and status
+    """
+    erp = request.app[ERP]
+    try:
+        part_id = request.query.get("part_id")
+
+        if not part_id:
+            return error("Parameter 'part_id' is required", 400)
+
+        part_response = await erp.get(f"/parts/{part_id}")
+
+        if part_response.status_code != 200:
+            return error(f"Product with ID {part_id} not found", 500)
+
+        part_data = part_response.json()
+
+        product_type = part_data.get("type")
+        stock_response = await erp.get(f"/stock/{product_type}")
+
+        if stock_response.status_code != 200:
+            return error(f"Stock for type {product_type} not found", 500)
+
+        stock_data = stock_response.json()
+
+        return web.json_response({
+            "id": int(part_id),
+            "type": part_data.get("type"),
+            "stock": stock_data.get("stock"),
+            "status": part_data.get("status")
+        })
+
+    except Exception as e:
+        registry.observe_exception(e)
+        return error(f"Internal error: {str(e)}", 500)
+
+
+# Get the nearest technicians
+async def get_nearest_technicians(request):
+    """
+    Endpoint to fetch the nearest technicians to a specific location.
+    Parameters:
+        lat: Latitude of the location
+        lon: Longitude of the location
+        k: Number of technicians to return (2 by default)
+        max_km: Optional maximum distance in kilometers
+    Returns:
+        JSON list containing the closest technicians, nearest first
+    """
+    erp = request.app[ERP]
+    try:
+        query, message = parse_technician_query(request.query)
+
+        if message:
+            return error(message, 400)
+
+        lat, lon, k, max_km = query
+
+        if STREAM_TECHNICIANS:
+            return await stream_nearest_technicians(erp, lat, lon, k, max_km)
+
+        response = await erp.get("/technicians/available")
+
+        if response.status_code != 200:
+            return error("Unable to retrieve technician list", 500)
+
+        # Comparing the roster with the last one, and indexing it when it changed, takes
+        # from milliseconds to a second for a large roster: off the event loop
+        nearest = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: technician_indexes.get(response).nearest(lat, lon, k, max_km))
+        return web.json_response(nearest)
+
+    except Exception as e:
+        registry.observe_exception(e)
+        return error(f"Internal error: {str(e)}", 500)
+
+
+async def stream_nearest_technicians(erp, lat, lon, k, max_km):
+    """Ranks the roster while it downloads, without holding it in memory."""
+    async with erp.stream("/technicians/available") as response:
+        if response.status != 200:
+            return error("Unable to retrieve technician list", 500)
+
+        decoder = JsonArrayDecoder()
+        nearest = NearestTechnicians(lat, lon, k, max_km)
+        async for chunk in response.content.iter_chunked(ROSTER_CHUNK_SIZE):
+            nearest.add(decoder.feed(chunk))
+        nearest.add(decoder.close())
+
+    return web.json_response(nearest.result())
+
+
+# Prometheus metrics
+async def get_metrics(request):
+    """
+    Endpoint exposing request latencies, ERP call timings and technician index builds.
+    Returns:
+        The metrics in the Prometheus text exposition format
+    """
+    return web.Response(body=registry.to_prometheus().encode(), headers={"Content-Type": METRICS_CONTENT_TYPE})
+
+
+@web.middleware
+async def record_request(request, handler):
+    """Records each request's latency and status code by route."""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        route = request.match_info.route.resource
+        route = route.canonical if route is not None else UNMATCHED_ROUTE
+        registry.observe_request(route, request.method, status, time.perf_counter() - start)
+
+
+def create_app(erp=None):
+    """Builds the aiohttp application, calling the ERP through erp (an AsyncErpClient by default)."""
+    app = web.Application(middlewares=[record_request])
+    app[ERP] = erp if erp is not None else AsyncErpClient()
+    app.router.add_get("/api/products", get_product)
+    app.router.add_get("/api/technicians/nearest", get_nearest_technicians)
+    app.router.add_get("/metrics", get_metrics)
+
+    async def close_erp(app):
+        await app[ERP].close()
+    app.on_cleanup.append(close_erp)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3000)
+    args = parser.parse_args()
+
+    web.run_app(create_app(), host=args.host, port=args.port, backlog=1024)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Entry:
+    __slots__ = ("value", "expires", "stale_until")
+
+    def __init__(self, value, expires, stale_until):
+        self.value = value
+        self.expires = expires
+        self.stale_until = stale_until
+
+
+class _Flight:
+    """An upstream load in progress, shared by every caller waiting on the same key."""
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TtlCache:
+    """
+    Thread-safe in-process cache with per-call TTLs and LRU eviction.
+
+    Concurrent misses for the same key are coalesced into a single load (single-flight):
+    the first caller runs the loader and the others wait for its result or exception.
+    With a stale_ttl, an expired entry is still served for that long after expiring
+    while one background load refreshes it (stale-while-revalidate).
+    """
+
+    def __init__(self, max_entries=4096, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.refresh_errors = 0
+
+    def get(self, key, loader, ttl, stale_ttl=0.0, cacheable=None):
+        """
+        Returns the cached value for key, calling loader() to fetch it when missing or expired.
+
+        Args:
+            key: Cache key
+            loader: Function fetching the value upstream
+            ttl: Seconds the value stays fresh
+            stale_ttl: Seconds an expired value may still be served while it is refreshed
+            cacheable: Optional predicate; values it rejects are returned but not stored
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            now = self.clock()
+            if entry is not None and now < entry.stale_until:
+                self._entries.move_to_end(key)
+                if now < entry.expires:
+                    self.hits += 1
+                    return entry.value
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    flight = self._inflight[key] = _Flight()
+                    threading.Thread(target=self._load, args=(key, flight, loader, ttl, stale_ttl, cacheable),
+                                     daemon=True).start()
+                return entry.value
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = self._inflight[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if leader:
+            self._load(key, flight, loader, ttl, stale_ttl, cacheable)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _load(self, key, flight, loader, ttl, stale_ttl, cacheable):
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+        with self._lock:
+            del self._inflight[key]
+            if flight.error is not None:
+                # A failed background refresh leaves the stale entry to be served
+                self.refresh_errors += key in self._entries
+            elif cacheable is None or cacheable(flight.value):
+                now = self.clock()
+                self._entries[key] = _Entry(flight.value, now + ttl, now + ttl + stale_ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        flight.done.set()
+
+    def peek(self, key):
+        """Returns the last value stored for key, even expired, or None; counts as no lookup."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.value if entry is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "refresh_errors": self.refresh_errors,
+                "hit_ratio": round((self.hits + self.stale_hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,274 @@
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from api_rest.cache import TtlCache
+from api_rest.metrics import ERP_ENDPOINTS, erp_endpoint, registry
+from api_rest.resilience import CircuitBreaker, CircuitOpenError, LatencyWindow
+
+# Base URL of the legacy ERP API
+LEGACY_ERP_BASE_URL = (
+    "https://cdn.nuwe.io/challenges-ds-datasets/hackathon-schneider-erp"
+)
+
+# Connection settings, overridable through the environment
+ERP_BASE_URL = os.environ.get("ERP_BASE_URL", LEGACY_ERP_BASE_URL)
+ERP_POOL_SIZE = int(os.environ.get("ERP_POOL_SIZE", 32))
+ERP_CONNECT_TIMEOUT = float(os.environ.get("ERP_CONNECT_TIMEOUT", 3.05))
+ERP_READ_TIMEOUT = float(os.environ.get("ERP_READ_TIMEOUT", 10))
+ERP_RETRIES = int(os.environ.get("ERP_RETRIES", 2))
+ERP_RETRY_BACKOFF = float(os.environ.get("ERP_RETRY_BACKOFF", 0.2))
+
+# Response caching: seconds each kind of ERP data stays fresh, and how long it may be
+# served stale while it is refreshed in the background (0 disables stale serving)
+ERP_CACHE_SIZE = int(os.environ.get("ERP_CACHE_SIZE", 4096))
+ERP_CACHE_TTLS = {
+    "/parts/": float(os.environ.get("ERP_CACHE_TTL_PARTS", 300)),
+    "/stock/": float(os.environ.get("ERP_CACHE_TTL_STOCK", 30)),
+    "/technicians/available": float(os.environ.get("ERP_CACHE_TTL_TECHNICIANS", 60)),
+}
+ERP_CACHE_STALE_TTL = float(os.environ.get("ERP_CACHE_STALE_TTL", 30))
+
+# Circuit breaker per ERP endpoint: opens when failed (5xx or no answer) or slow calls
+# make up failure_ratio of the last `window` calls, then fails fast for open_seconds
+ERP_BREAKER = {
+    "failure_ratio": float(os.environ.get("ERP_BREAKER_FAILURE_RATIO", 0.5)),
+    "slow_call_seconds": float(os.environ.get("ERP_BREAKER_SLOW_CALL", 2.0)),
+    "window": int(os.environ.get("ERP_BREAKER_WINDOW", 20)),
+    "min_calls": int(os.environ.get("ERP_BREAKER_MIN_CALLS", 10)),
+    "open_seconds": float(os.environ.get("ERP_BREAKER_OPEN_SECONDS", 5.0)),
+}
+
+# Hedged requests: a GET still unanswered after the endpoint's recent p95 latency (and at
+# least ERP_HEDGE_MIN_DELAY) is sent again, for at most ERP_HEDGE_BUDGET of all calls
+ERP_HEDGE = os.environ.get("ERP_HEDGE", "0") == "1"
+ERP_HEDGE_MIN_DELAY = float(os.environ.get("ERP_HEDGE_MIN_DELAY", 0.005))
+ERP_HEDGE_BUDGET = float(os.environ.get("ERP_HEDGE_BUDGET", 0.1))
+
+# Transient upstream failures worth retrying; a 404 is an answer, not a failure
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class ErpClient:
+    """
+    Shared HTTP client for the legacy ERP.
+
+    A single requests.Session keeps connections to the ERP alive and reuses them across
+    requests and threads, up to pool_size connections. Every call has a connect and a
+    read timeout, and connection errors and transient statuses are retried up to
+    `retries` times: once straight away, then with exponential backoff (2 * backoff,
+    4 * backoff, ...). Each call's duration and outcome are recorded in metrics, an
+    ApiMetrics (the API's shared registry by default, None to record nothing).
+    """
+
+    def __init__(self, base_url=ERP_BASE_URL, pool_size=ERP_POOL_SIZE, connect_timeout=ERP_CONNECT_TIMEOUT,
+                 read_timeout=ERP_READ_TIMEOUT, retries=ERP_RETRIES, backoff=ERP_RETRY_BACKOFF, metrics=registry):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.metrics = metrics
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry, pool_block=False)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, path):
+        """
+        Sends a GET request to the ERP.
+
+        Args:
+            path: Path below the base URL, e.g. "/parts/1"
+
+        Returns:
+            The requests.Response, whatever its status code
+        """
+        return self._send(path)
+
+    def stream(self, path):
+        """
+        Sends a GET request to the ERP without reading the body, for iterating over it
+        with iter_content. Use the response as a context manager to release the connection.
+        """
+        return self._send(path, stream=True)
+
+    def _send(self, path, stream=False):
+        url = f"{self.base_url}{path}"
+        if self.metrics is None:
+            return self.session.get(url, timeout=self.timeout, stream=stream)
+        return self.metrics.timed_erp_call(path, lambda: self.session.get(url, timeout=self.timeout, stream=stream))
+
+    def close(self):
+        self.session.close()
+
+
+class ResilientErpClient:
+    """
+    Guards each ERP endpoint (parts, stock, technicians) with its own CircuitBreaker, so
+    one failing or slow endpoint fails fast instead of holding worker threads for the
+    full timeouts, while the others keep working.
+
+    With hedging, a GET still unanswered after the endpoint's recent p95 latency is
+    sent a second time and the first answer wins. Hedges are capped at hedge_budget of
+    all calls, so that they cannot double the load on an ERP that is already slow.
+    """
+
+    def __init__(self, client, breaker=None, hedge=ERP_HEDGE, hedge_min_delay=ERP_HEDGE_MIN_DELAY,
+                 hedge_budget=ERP_HEDGE_BUDGET, hedge_workers=2 * ERP_POOL_SIZE):
+        self.client = client
+        settings = ERP_BREAKER if breaker is None else breaker
+        self.breakers = {endpoint: CircuitBreaker(endpoint, **settings)
+                         for endpoint in [name for _, name in ERP_ENDPOINTS] + ["other"]}
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_budget = hedge_budget
+        self.latencies = {endpoint: LatencyWindow() for endpoint in self.breakers}
+        self.executor = ThreadPoolExecutor(hedge_workers, thread_name_prefix="erp-hedge") if hedge else None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def get(self, path):
+        """
+        Sends a GET request to the ERP, unless the endpoint's circuit is open.
+
+        Raises:
+            CircuitOpenError: The endpoint's circuit breaker is open
+        """
+        endpoint = erp_endpoint(path)
+        breaker = self.breakers[endpoint]
+        breaker.before_call()
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = self._hedged_get(path, endpoint) if self.hedge else self.client.get(path)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            seconds = time.perf_counter() - start
+            breaker.record(failed, seconds)
+            self.latencies[endpoint].record(seconds)
+
+    def _hedged_get(self, path, endpoint):
+        first = self.executor.submit(self.client.get, path)
+        p95 = self.latencies[endpoint].value
+        with self._lock:
+            self.calls += 1
+        if p95 is None:
+            return first.result()
+        try:
+            return first.result(timeout=max(p95, self.hedge_min_delay))
+        except FutureTimeoutError:
+            pass
+
+        with self._lock:
+            if self.hedges >= self.hedge_budget * self.calls:
+                hedge = None
+            else:
+                self.hedges += 1
+                hedge = self.executor.submit(self.client.get, path)
+        if hedge is None:
+            return first.result()
+        done, _ = wait((first, hedge), return_when=FIRST_COMPLETED)
+        winner = done.pop()
+        if winner.exception() is not None:
+            # The other request may still succeed
+            winner = hedge if winner is first else first
+        elif winner is hedge:
+            with self._lock:
+                self.hedge_wins += 1
+        return winner.result()
+
+    def stream(self, path):
+        """Streamed responses go through the circuit breaker but are never hedged."""
+        breaker = self.breakers[erp_endpoint(path)]
+        breaker.before_call()
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = self.client.stream(path)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            breaker.record(failed, time.perf_counter() - start)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "breakers": {endpoint: {"state": breaker.state, "opened": breaker.opened,
+                                        "rejections": breaker.rejections}
+                             for endpoint, breaker in self.breakers.items()},
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+            }
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        self.client.close()
+
+
+class CachedErpClient:
+    """
+    Caches successful ERP responses by path in a TtlCache, with a TTL per kind of path.
+    Paths without a TTL, and non-200 responses, always go to the ERP.
+
+    When the ERP cannot answer a cached path (an error status, no response at all, or
+    an open circuit), the last response cached for it is served instead, however old.
+    """
+
+    def __init__(self, client, cache=None, ttls=None, stale_ttl=ERP_CACHE_STALE_TTL):
+        self.client = client
+        self.cache = cache if cache is not None else TtlCache(ERP_CACHE_SIZE)
+        self.ttls = ERP_CACHE_TTLS if ttls is None else ttls
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self.fallbacks = 0
+
+    def get(self, path):
+        ttl = next((ttl for prefix, ttl in self.ttls.items() if path.startswith(prefix)), None)
+        if not ttl:
+            return self.client.get(path)
+        try:
+            response = self.cache.get(path, lambda: self.client.get(path), ttl, self.stale_ttl,
+                                      cacheable=lambda response: response.status_code == 200)
+        except (requests.RequestException, CircuitOpenError):
+            fallback = self._fallback(path)
+            if fallback is None:
+                raise
+            return fallback
+        if response.status_code >= 500:
+            fallback = self._fallback(path)
+            if fallback is not None:
+                return fallback
+        return response
+
+    def _fallback(self, path):
+        response = self.cache.peek(path)
+        if response is not None:
+            with self._lock:
+                self.fallbacks += 1
+        return response
+
+    def stream(self, path):
+        """Streamed responses are never cached."""
+        return self.client.stream(path)
+
+    def stats(self):
+        return {**self.cache.stats(), "fallbacks": self.fallbacks}
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,222 @@
+"""
+Local stand-in for the legacy ERP, for tests and load tests.
+
+Serves /parts/{id}, /stock/{type} and /technicians/available over HTTP/1.1 with
+keep-alive. A delay per response, overridable per endpoint, simulates a slow ERP, and
+an error rate answers that share of requests with a 503. Parts 1 to 4 follow the
+README examples; the remaining data is synthetic, in any size.
+
+Usage:
+    python api_rest/fake_erp.py --port 8081 --latency-ms 20 --error-rate 0.01 \
+        --parts 10000 --technicians 50000 --endpoint-latency-ms technicians=150
+    ERP_BASE_URL=http://127.0.0.1:8081 python api_rest/main.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PARTS = {
+    "1": {"part_id": "1", "type": "A05", "status": "ok"},
+    "2": {"part_id": "2", "type": "B12", "status": "ok"},
+    "3": {"part_id": "3", "type": "A05", "status": "discontinued"},
+    "4": {"part_id": "4", "type": "C07", "status": "ok"},
+}
+STOCK = {"A05": 76, "B12": 0, "C07": 15}
+TECHNICIANS = [
+    {"id": "1", "name": "Ian", "latitude": 48.56181, "longitude": 43.50553},
+    {"id": "2", "name": "Laura", "latitude": 40.41678, "longitude": -3.70379},
+    {"id": "3", "name": "Marc", "latitude": 41.38506, "longitude": 2.17340},
+    {"id": "4", "name": "Sofia", "latitude": 52.52001, "longitude": 13.40495},
+    {"id": "5", "name": "Pierre", "latitude": 48.85661, "longitude": 2.35222},
+    {"id": "6", "name": "Anna", "latitude": 59.32932, "longitude": 18.06858},
+]
+
+ENDPOINTS = ("parts", "stock", "technicians")
+
+
+def generate_parts(count, types=10, seed=42):
+    """
+    Args:
+        count: Number of parts, numbered from 1; the first four are the README's
+        types: Number of synthetic stock types the other parts are spread over
+        seed: Seed of the random stock levels, types and statuses
+
+    Returns:
+        The parts by id and the stock by type, as FakeErp takes them
+    """
+    rng = random.Random(seed)
+    parts = {part_id: part for part_id, part in PARTS.items() if int(part_id) <= count}
+    stock = dict(STOCK)
+    type_names = [f"T{i:02d}" for i in range(types)]
+    stock.update((name, rng.randrange(200)) for name in type_names)
+    for i in range(len(PARTS) + 1, count + 1):
+        status = "discontinued" if rng.random() < 0.1 else "ok"
+        parts[str(i)] = {"part_id": str(i), "type": rng.choice(type_names), "status": status}
+    return parts, stock
+
+
+def generate_roster(count, seed=42):
+    """Technicians scattered within a few hundred km of 200 random centres."""
+    rng = random.Random(seed)
+    centres = [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(200)]
+    roster = []
+    for i in range(count):
+        lat, lon = rng.choice(centres)
+        roster.append({"id": str(i), "name": f"Tech {i}",
+                       "latitude": max(-90.0, min(90.0, lat + rng.gauss(0, 2))),
+                       "longitude": (lon + rng.gauss(0, 2) + 180) % 360 - 180})
+    return roster
+
+
+class FakeErpHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; with Nagle's algorithm on, a reused
+    # connection stalls on the client's delayed ACK between them
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            failing = server.fail_next > 0 or (server.error_rate and server.random.random() < server.error_rate)
+            server.fail_next -= server.fail_next > 0
+            slow = server.slow_next > 0 or (server.slow_rate and server.random.random() < server.slow_rate)
+            server.slow_next -= server.slow_next > 0
+
+        parts = self.path.strip("/").split("/")
+        latency = server.slow_latency if slow else server.latencies.get(parts[0], server.latency)
+        if latency:
+            time.sleep(latency)
+        if failing:
+            return self._send(503, {"error": "Service unavailable"})
+
+        if len(parts) == 2 and parts[0] == "parts" and parts[1] in server.parts:
+            self._send(200, server.parts[parts[1]])
+        elif len(parts) == 2 and parts[0] == "stock" and parts[1] in server.stock:
+            self._send(200, {"type": parts[1], "stock": server.stock[parts[1]]})
+        elif parts == ["technicians", "available"]:
+            self._send_body(200, server.technicians_body())
+        else:
+            self._send(404, {"error": "Not found"})
+
+    def _send(self, status, payload):
+        self._send_body(status, json.dumps(payload).encode("utf-8"))
+
+    def _send_body(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeErp(ThreadingHTTPServer):
+    """
+    The fake ERP server. Counts the requests it serves and the TCP connections they
+    arrive on, so tests can check that clients reuse connections. Setting fail_next
+    answers that many upcoming requests with a 503; error_rate fails that share of
+    all requests at random, reproducibly for a given seed.
+
+    latency is the delay before every response, in seconds, and latencies overrides
+    it per endpoint ("parts", "stock" or "technicians"). For a latency tail, slow_rate
+    of the requests (or the next slow_next ones) wait slow_latency instead.
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, parts=None, stock=None, technicians=None,
+                 latencies=None, error_rate=0.0, slow_rate=0.0, slow_latency=1.0, seed=0):
+        super().__init__((host, port), FakeErpHandler)
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.latencies = latencies or {}
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.random = random.Random(seed)
+        self.parts = PARTS if parts is None else parts
+        self.stock = STOCK if stock is None else stock
+        self.technicians = TECHNICIANS if technicians is None else technicians
+        self.requests = 0
+        self.connections = 0
+        self.fail_next = 0
+        self.slow_next = 0
+
+    @property
+    def technicians(self):
+        return self._technicians
+
+    @technicians.setter
+    def technicians(self, technicians):
+        # Encoded once per roster: a large roster would otherwise dominate a load test
+        with self.lock:
+            self._technicians = technicians
+            self._technicians_body = None
+
+    def technicians_body(self):
+        with self.lock:
+            if self._technicians_body is None:
+                self._technicians_body = json.dumps(self._technicians).encode("utf-8")
+            return self._technicians_body
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serves from a daemon thread and returns the server's base URL."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay before every response")
+    parser.add_argument("--endpoint-latency-ms", nargs="*", default=[], metavar="ENDPOINT=MS",
+                        help=f"Delay for one endpoint instead, one of {', '.join(ENDPOINTS)}")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests delayed by --slow-latency-ms")
+    parser.add_argument("--slow-latency-ms", type=float, default=1000.0)
+    parser.add_argument("--parts", type=int, default=len(PARTS))
+    parser.add_argument("--stock-types", type=int, default=10, help="Stock types of the synthetic parts")
+    parser.add_argument("--technicians", type=int, default=0,
+                        help="Size of a synthetic roster (the six sample technicians by default)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    latencies = {}
+    for value in args.endpoint_latency_ms:
+        endpoint, _, ms = value.partition("=")
+        if endpoint not in ENDPOINTS or not ms:
+            parser.error(f"--endpoint-latency-ms expects ENDPOINT=MS with ENDPOINT one of {', '.join(ENDPOINTS)}")
+        latencies[endpoint] = float(ms) / 1000
+
+    parts, stock = generate_parts(args.parts, args.stock_types, args.seed) if args.parts > len(PARTS) else (None, None)
+    technicians = generate_roster(args.technicians, args.seed) if args.technicians else None
+    server = FakeErp(args.host, args.port, latency=args.latency_ms / 1000, parts=parts, stock=stock,
+                     technicians=technicians, latencies=latencies, error_rate=args.error_rate,
+                     slow_rate=args.slow_rate, slow_latency=args.slow_latency_ms / 1000, seed=args.seed)
+    print(f"Fake ERP listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+import heapq
+import math
+import threading
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+# Points per k-d tree leaf; scanning a small bucket beats descending further in Python
+LEAF_SIZE = 8
+
+# Queries for more than 1/VECTORIZED_FRACTION of the roster scan it with NumPy instead
+# of walking the tree, which stops paying off once it visits most leaves
+VECTORIZED_FRACTION = 64
+
+# Rounding margin for re-ranking candidates: anything up to 0.01 km beyond the k-th may
+# round to the same distance, plus slack for the rounding error between computations
+RANK_MARGIN_KM = 0.01 + 1e-6
+
+
+# Calculate distance using the Haversine formula
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Calculates the distance between two points on Earth using the Haversine formula.
+
+    Args:
+        lat1, lon1: Latitude and longitude of the first point (in degrees)
+        lat2, lon2: Latitude and longitude of the second point (in degrees)
+
+    Returns:
+        Distance in kilometers between the two points
+    """
+    r = EARTH_RADIUS_KM
+
+    lat1_rad, lon1_rad = math.radians(lat1), math.radians(lon1)
+    lat2_rad, lon2_rad = math.radians(lat2), math.radians(lon2)
+
+    dlat = lat2_rad - lat1_rad
+    dlon = lon2_rad - lon1_rad
+
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return r * c
+
+
+def haversine_np(lat, lon, lats, lons):
+    """
+    Vectorized haversine from one point to many, in a single pass over the arrays.
+
+    Args:
+        lat, lon: Latitude and longitude of the point (in degrees)
+        lats, lons: Latitudes and longitudes of the other points (in radians)
+
+    Returns:
+        Array of distances in kilometers
+    """
+    lat_rad, lon_rad = math.radians(lat), math.radians(lon)
+    a = np.sin((lats - lat_rad) / 2) ** 2 + math.cos(lat_rad) * np.cos(lats) * np.sin((lons - lon_rad) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+# Points as 3D unit vectors: the straight-line (chord) distance between two of them
+# grows with the great-circle distance, so nearest by chord is nearest by haversine
+def unit_vector(lat, lon):
+    lat_rad, lon_rad = math.radians(lat), math.radians(lon)
+    return (math.cos(lat_rad) * math.cos(lon_rad), math.cos(lat_rad) * math.sin(lon_rad), math.sin(lat_rad))
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def km_to_chord(km):
+    return 2 * math.sin(min(math.pi, km / EARTH_RADIUS_KM) / 2)
+
+
+class KdTree:
+    """
+    Static k-d tree over 3D points, answering k-nearest and radius queries by squared
+    Euclidean distance. Internal nodes split at the median of their widest axis.
+    """
+
+    def __init__(self, points):
+        self.points = points
+        self.root = self._build(list(range(len(points)))) if points else None
+
+    def _build(self, indices):
+        if len(indices) <= LEAF_SIZE:
+            return indices
+        points = self.points
+        axis = max(range(3), key=lambda a: max(points[i][a] for i in indices) - min(points[i][a] for i in indices))
+        indices.sort(key=lambda i: points[i][axis])
+        middle = len(indices) // 2
+        # Node: (axis, split value, points at or below it, points above it)
+        return axis, points[indices[middle]][axis], self._build(indices[:middle]), self._build(indices[middle:])
+
+    def nearest(self, point, k):
+        """
+        Returns:
+            Up to k (squared distance, index) pairs, nearest first
+        """
+        heap = []  # max-heap of the best k, as (-squared distance, -index)
+        points = self.points
+
+        def visit(node):
+            if isinstance(node, list):
+                for i in node:
+                    p = points[i]
+                    d = (p[0] - point[0]) ** 2 + (p[1] - point[1]) ** 2 + (p[2] - point[2]) ** 2
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-d, -i))
+                    elif d < -heap[0][0]:
+                        heapq.heapreplace(heap, (-d, -i))
+                return
+            axis, split, below, above = node
+            diff = point[axis] - split
+            visit(below if diff <= 0 else above)
+            if len(heap) < k or diff * diff < -heap[0][0]:
+                visit(above if diff <= 0 else below)
+
+        if self.root is not None and k > 0:
+            visit(self.root)
+        return sorted((-d, -i) for d, i in heap)
+
+    def within(self, point, radius_sq):
+        """
+        Returns:
+            The indices of every point within sqrt(radius_sq) of point
+        """
+        found = []
+        points = self.points
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                for i in node:
+                    p = points[i]
+                    if (p[0] - point[0]) ** 2 + (p[1] - point[1]) ** 2 + (p[2] - point[2]) ** 2 <= radius_sq:
+                        found.append(i)
+                continue
+            axis, split, below, above = node
+            diff = point[axis] - split
+            if diff <= 0 or diff * diff <= radius_sq:
+                stack.append(below)
+            if diff >= 0 or diff * diff <= radius_sq:
+                stack.append(above)
+        return found
+
+
+class TechnicianIndex:
+    """
+    Nearest-technician queries over the roster, answered from a k-d tree of its unit
+    vectors, or with a vectorized haversine pass and argpartition when k is a large
+    share of the roster.
+
+    Results are identical to ranking the whole roster by haversine distance rounded to
+    0.01 km, with ties in roster order: both paths find the k-th nearest technician,
+    then rank every technician whose rounded distance could tie with it by haversine.
+    """
+
+    def __init__(self, technicians):
+        self.technicians = [
+            (int(tech["id"]), tech["name"], float(tech["latitude"]), float(tech["longitude"]))
+            for tech in technicians
+        ]
+        self.tree = KdTree([unit_vector(lat, lon) for _, _, lat, lon in self.technicians])
+        self.lats = np.radians(np.array([tech[2] for tech in self.technicians], dtype=float))
+        self.lons = np.radians(np.array([tech[3] for tech in self.technicians], dtype=float))
+
+    def __len__(self):
+        return len(self.technicians)
+
+    def nearest(self, lat, lon, k=2, max_km=None):
+        """
+        Args:
+            lat, lon: Latitude and longitude of the location (in degrees)
+            k: Number of technicians to return
+            max_km: Optional limit on distance_km
+
+        Returns:
+            Up to k of the closest technicians with their id, name and distance_km,
+            nearest first
+        """
+        k = min(k, len(self.technicians))
+        if k <= 0:
+            return []
+        if k * VECTORIZED_FRACTION >= len(self.technicians):
+            candidates = self._candidates_vectorized(lat, lon, k)
+        else:
+            candidates = self._candidates_tree(lat, lon, k)
+
+        ranked = sorted(
+            (round(haversine(lat, lon, self.technicians[i][2], self.technicians[i][3]), 2), i)
+            for i in candidates
+        )[:k]
+        return [
+            {"id": self.technicians[i][0], "name": self.technicians[i][1], "distance_km": distance}
+            for distance, i in ranked
+            if max_km is None or distance <= max_km
+        ]
+
+    def _candidates_tree(self, lat, lon, k):
+        point = unit_vector(lat, lon)
+        kth = math.sqrt(self.tree.nearest(point, k)[-1][0])
+        radius = km_to_chord(chord_to_km(kth) + RANK_MARGIN_KM)
+        return self.tree.within(point, radius * radius)
+
+    def _candidates_vectorized(self, lat, lon, k):
+        distances = haversine_np(lat, lon, self.lats, self.lons)
+        kth = distances[np.argpartition(distances, k - 1)[k - 1]]
+        return np.flatnonzero(distances <= kth + RANK_MARGIN_KM).tolist()
+
+
+class NearestTechnicians:
+    """
+    Bounded top-k ranking of technicians fed in roster order, e.g. while the roster is
+    still streaming in. Only the k best so far are kept, in a heap ordered like the
+    brute-force ranking (distance rounded to 0.01 km, then roster position), so memory
+    is O(k) and the results are identical.
+    """
+
+    def __init__(self, lat, lon, k=2, max_km=None):
+        self.lat = lat
+        self.lon = lon
+        self.k = k
+        self.max_km = max_km
+        self._heap = []  # max-heap as (-distance_km, -position, id, name)
+        self._position = 0
+
+    def add(self, technicians):
+        lat, lon, k, max_km, heap = self.lat, self.lon, self.k, self.max_km, self._heap
+        for tech in technicians:
+            position = self._position
+            self._position += 1
+            distance = round(haversine(lat, lon, float(tech["latitude"]), float(tech["longitude"])), 2)
+            if max_km is not None and distance > max_km:
+                continue
+            # A later technician at the same distance ranks after the ones already kept
+            if len(heap) < k:
+                heapq.heappush(heap, (-distance, -position, int(tech["id"]), tech["name"]))
+            elif k and distance < -heap[0][0]:
+                heapq.heapreplace(heap, (-distance, -position, int(tech["id"]), tech["name"]))
+
+    def result(self):
+        """
+        Returns:
+            The closest technicians with their id, name and distance_km, nearest first
+        """
+        return [
+            {"id": tech_id, "name": name, "distance_km": -distance}
+            for distance, _, tech_id, name in sorted(self._heap, reverse=True)
+        ]
+
+
+class TechnicianIndexCache:
+    """
+    Keeps the TechnicianIndex of the latest roster, rebuilding it only when the roster
+    changes. A response object seen last time is reused as is; otherwise its body is
+    compared with the last one (a memcmp, far cheaper than hashing or parsing it), so
+    an unchanged roster fetched again is neither parsed nor indexed again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._response = None
+        self._index = None
+        self.builds = 0
+
+    def get(self, response):
+        """
+        Args:
+            response: ERP response holding the /technicians/available roster
+
+        Returns:
+            The TechnicianIndex for that roster
+        """
+        with self._lock:
+            if response is self._response:
+                return self._index
+            if self._response is None or response.content != self._response.content:
+                self._index = TechnicianIndex(response.json())
+                self.builds += 1
+            self._response = response
+            return self._index
@@ -1,44 +1,61 @@
-from flask import Flask, request, jsonify
-import requests
-import math
-
-# Base URL of the legacy ERP API
-LEGACY_ERP_BASE_URL = (
-    "https://cdn.nuwe.io/challenges-ds-datasets/hackathon-schneider-erp"
+from flask import Flask, Response, request, jsonify
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import os
+import sys
+import time
+
+if __package__ in (None, ""):
+    # Run as a script: make the api_rest package importable
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from api_rest.cache import TtlCache
+from api_rest.erp_client import CachedErpClient, ErpClient, ResilientErpClient
+from api_rest.geo import NearestTechnicians, haversine
+from api_rest.metrics import METRICS_CONTENT_TYPE, UNMATCHED_ROUTE, cache_metrics, registry, resilience_metrics
+from api_rest.technicians import (
+    ROSTER_CHUNK_SIZE, STREAM_TECHNICIANS, parse_technician_query, technician_indexes, technician_metrics
 )
+from data_transformation.streaming import JsonArrayDecoder
+
 app = Flask(__name__)
 
+# Pooled keep-alive connections to the legacy ERP, shared by all requests, behind a
+# circuit breaker per endpoint, with slowly changing parts, stock and technician data
+# cached in process (and served from there when the ERP cannot answer)
+erp_guard = ResilientErpClient(ErpClient())
+erp = CachedErpClient(erp_guard)
 
-# Retrieve product details from the legacy ERP
-@app.route("/api/products", methods=["GET"])
-def get_product():
+# Batch lookups: largest accepted batch, and ERP calls in flight across all batches
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 500))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 32))
+batch_executor = ThreadPoolExecutor(BATCH_CONCURRENCY, thread_name_prefix="erp-batch")
+
+# Look up a product in the legacy ERP
+def fetch_product(part_id, get=None):
     """
-    Endpoint to fetch information about a specific product.
-    Parameters:
+    Fetches a part and the stock of its type.
+
+    Args:
         part_id: ID of the part to be queried
+        get: Function sending a GET request to the ERP (erp.get by default)
+
     Returns:
-        JSON containing product details including id, type, stock, and status
+        The product details or an error, and the HTTP status code for them
     """
+    get = get or erp.get
     try:
-        part_id = request.args.get("part_id")
-
-        if not part_id:
-            return jsonify({"error": "Parameter 'part_id' is required"}), 400
-
-        part_url = f"{LEGACY_ERP_BASE_URL}/parts/{part_id}"
-        part_response = requests.get(part_url)
+        part_response = get(f"/parts/{part_id}")
 
         if part_response.status_code != 200:
-            return jsonify({"error": f"Product with ID {part_id} not found"}), 500
+            return {"error": f"Product with ID {part_id} not found"}, 500
 
         part_data = part_response.json()
 
         product_type = part_data.get("type")
-        stock_url = f"{LEGACY_ERP_BASE_URL}/stock/{product_type}"
-        stock_response = requests.get(stock_url)
+        stock_response = get(f"/stock/{product_type}")
 
         if stock_response.status_code != 200:
-            return jsonify({"error": f"Stock for type {product_type} not found"}), 500
+            return {"error": f"Stock for type {product_type} not found"}, 500
 
         stock_data = stock_response.json()
 
@@ -49,84 +66,215 @@ def get_product():
             "status": part_data.get("status")
         }
 
-        return jsonify(response), 200
+        return response, 200
 
     except Exception as e:
-        return jsonify({"error": f"Internal error: {str(e)}"}), 500
+        registry.observe_exception(e)
+        return {"error": f"Internal error: {str(e)}"}, 500
 
 
-# Calculate distance using the Haversine formula
-def haversine(lat1, lon1, lat2, lon2):
+# Retrieve product details from the legacy ERP
+@app.route("/api/products", methods=["GET"])
+def get_product():
     """
-    Calculates the distance between two points on Earth using the Haversine formula.
+    Endpoint to fetch information about a specific product.
+    Parameters:
+        part_id: ID of the part to be queried
+    Returns:
+        JSON containing product details including id, type, stock, and status
+    """
+    part_id = request.args.get("part_id")
 
-    Args:
-        lat1, lon1: Latitude and longitude of the first point (in degrees)
-        lat2, lon2: Latitude and longitude of the second point (in degrees)
+    if not part_id:
+        return jsonify({"error": "Parameter 'part_id' is required"}), 400
+
+    response, status_code = fetch_product(part_id)
+    return jsonify(response), status_code
 
+
+# Retrieve many products at once
+@app.route("/api/products/batch", methods=["GET", "POST"])
+def get_products_batch():
+    """
+    Endpoint to fetch information about many products in one call.
+    Parameters:
+        part_ids: IDs of the parts to be queried, as a JSON list in a POST body
+            ({"part_ids": [1, 2]}) or comma-separated in the query string (?part_ids=1,2)
     Returns:
-        Distance in kilometers between the two points
+        JSON with one result per part id, in request order: its status_code and either
+        the product (as /api/products returns it) or the error
     """
-    r = 6371.0  # Earth's radius in km
+    if request.method == "POST":
+        part_ids = (request.get_json(silent=True) or {}).get("part_ids")
+    else:
+        part_ids = [part_id for value in request.args.getlist("part_ids") for part_id in value.split(",")]
+
+    if not part_ids or not isinstance(part_ids, list):
+        return jsonify({"error": "Parameter 'part_ids' is required"}), 400
+    if len(part_ids) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"At most {MAX_BATCH_SIZE} part ids per batch"}), 400
+
+    part_ids = ["" if part_id is None else str(part_id).strip() for part_id in part_ids]
 
-    lat1_rad, lon1_rad = math.radians(lat1), math.radians(lon1)
-    lat2_rad, lon2_rad = math.radians(lat2), math.radians(lon2)
+    # Parts are fetched concurrently; a batch-local cache makes every distinct part and
+    # stock type a single ERP call, even when several parts ask for it at the same time
+    batch_calls = TtlCache(max_entries=2 * len(part_ids))
 
-    dlat = lat2_rad - lat1_rad
-    dlon = lon2_rad - lon1_rad
+    def get(path):
+        return batch_calls.get(path, lambda: erp.get(path), ttl=float("inf"))
+
+    def fetch(part_id):
+        # An empty id is answered like /api/products without part_id, not sent to the ERP
+        if not part_id:
+            return {"error": "Parameter 'part_id' is required"}, 400
+        return fetch_product(part_id, get)
 
-    a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    results = []
+    products = batch_executor.map(fetch, part_ids)
+    for part_id, (response, status_code) in zip(part_ids, products):
+        if status_code == 200:
+            results.append({"part_id": part_id, "status_code": status_code, "product": response})
+        else:
+            results.append({"part_id": part_id, "status_code": status_code, "error": response["error"]})
 
-    return r * c
+    return jsonify({
+        "results": results,
+        "errors": sum(result["status_code"] != 200 for result in results),
+    }), 200
 
 
-# Get the 2 nearest technicians
+# Rank technicians by distance
+def nearest_technicians(technicians, lat, lon, count=2):
+    """
+    Finds the technicians closest to a location by ranking the whole list. The endpoint
+    answers from a TechnicianIndex instead, with identical results.
+
+    Args:
+        technicians: Technician list as returned by the legacy ERP
+        lat, lon: Latitude and longitude of the location (in degrees)
+        count: Number of technicians to return
+
+    Returns:
+        The closest technicians with their id, name and distance_km, nearest first
+    """
+    technicians_with_distance = [
+        {
+            "id": int(tech["id"]),
+            "name": tech["name"],
+            "distance_km": round(haversine(lat, lon, float(tech["latitude"]), float(tech["longitude"])), 2)
+        }
+        for tech in technicians
+    ]
+
+    technicians_with_distance.sort(key=lambda x: x["distance_km"])
+
+    return technicians_with_distance[:count]
+
+
+# Get the nearest technicians
 @app.route("/api/technicians/nearest", methods=["GET"])
 def get_nearest_technicians():
     """
-    Endpoint to fetch the two nearest technicians to a specific location.
+    Endpoint to fetch the nearest technicians to a specific location.
     Parameters:
         lat: Latitude of the location
         lon: Longitude of the location
+        k: Number of technicians to return (2 by default)
+        max_km: Optional maximum distance in kilometers
     Returns:
-        JSON list containing the two closest technicians
+        JSON list containing the closest technicians, nearest first
     """
     try:
-        lat = request.args.get("lat")
-        lon = request.args.get("lon")
+        query, error = parse_technician_query(request.args)
+
+        if error:
+            return jsonify({"error": error}), 400
 
-        if not lat or not lon:
-            return jsonify({"error": "Parameters 'lat' and 'lon' are required"}), 400
+        lat, lon, k, max_km = query
 
-        try:
-            lat, lon = float(lat), float(lon)
-        except ValueError:
-            return jsonify({"error": "Coordinates 'lat' and 'lon' must be valid numbers"}), 400
+        if STREAM_TECHNICIANS:
+            return stream_nearest_technicians(lat, lon, k, max_km)
 
-        technicians_url = f"{LEGACY_ERP_BASE_URL}/technicians/available"
-        response = requests.get(technicians_url)
+        response = erp.get("/technicians/available")
 
         if response.status_code != 200:
             return jsonify({"error": "Unable to retrieve technician list"}), 500
 
-        technicians = response.json()
+        return jsonify(technician_indexes.get(response).nearest(lat, lon, k, max_km)), 200
 
-        technicians_with_distance = [
-            {
-                "id": int(tech["id"]),
-                "name": tech["name"],
-                "distance_km": round(haversine(lat, lon, float(tech["latitude"]), float(tech["longitude"])), 2)
-            }
-            for tech in technicians
-        ]
+    except Exception as e:
+        registry.observe_exception(e)
+        return jsonify({"error": f"Internal error: {str(e)}"}), 500
 
-        technicians_with_distance.sort(key=lambda x: x["distance_km"])
 
-        return jsonify(technicians_with_distance[:2]), 200
+def stream_nearest_technicians(lat, lon, k, max_km):
+    """
+    Ranks the roster while it downloads, without holding it in memory.
 
-    except Exception as e:
-        return jsonify({"error": f"Internal error: {str(e)}"}), 500
+    Returns:
+        The response for get_nearest_technicians
+    """
+    with erp.stream("/technicians/available") as response:
+        if response.status_code != 200:
+            return jsonify({"error": "Unable to retrieve technician list"}), 500
+
+        decoder = JsonArrayDecoder()
+        nearest = NearestTechnicians(lat, lon, k, max_km)
+        for chunk in response.iter_content(ROSTER_CHUNK_SIZE):
+            nearest.add(decoder.feed(chunk))
+        nearest.add(decoder.close())
+
+    return jsonify(nearest.result()), 200
+
+
+# Cache statistics
+@app.route("/api/cache/stats", methods=["GET"])
+def get_cache_stats():
+    """
+    Endpoint to inspect the ERP response cache.
+    Returns:
+        JSON with the cache size and its hit, miss, coalesced, eviction and fallback counters
+    """
+    stats = erp.stats() if hasattr(erp, "stats") else {}
+    return jsonify(stats), 200
+
+
+# Record each request's latency and status code by route
+# (each access through the request proxy costs about a microsecond, so it is resolved once)
+@app.before_request
+def start_request_timer():
+    request.environ["erp_api.started"] = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    current = request._get_current_object()
+    route = current.url_rule.rule if current.url_rule is not None else UNMATCHED_ROUTE
+    registry.observe_request(route, current.method, response.status_code,
+                             time.perf_counter() - current.environ["erp_api.started"])
+    return response
+
+
+def collect_metrics():
+    """Reads the cache and circuit breaker counters when the metrics are scraped, not per request."""
+    families = cache_metrics(erp.stats()) if hasattr(erp, "stats") else []
+    families += resilience_metrics(erp_guard.stats())
+    return families
+
+
+registry.add_collector(collect_metrics)
+registry.add_collector(technician_metrics)
+
+
+# Prometheus metrics
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Endpoint exposing request latencies, ERP call timings and cache effectiveness.
+    Returns:
+        The metrics in the Prometheus text exposition format
+    """
+    return Response(registry.to_prometheus(), content_type=METRICS_CONTENT_TYPE)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,206 @@
+import bisect
+import threading
+import time
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# ERP endpoints by path prefix, so upstream timings are not labelled per part or stock type
+ERP_ENDPOINTS = (("/parts/", "parts"), ("/stock/", "stock"), ("/technicians/", "technicians"))
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+CIRCUIT_STATES = ("closed", "open", "half_open")
+
+# Route label for requests that matched no route, e.g. 404s for arbitrary paths
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def erp_endpoint(path):
+    for prefix, endpoint in ERP_ENDPOINTS:
+        if path.startswith(prefix):
+            return endpoint
+    return "other"
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+
+class Histogram:
+    """Latency histogram with fixed buckets; callers hold the ApiMetrics lock."""
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+
+    def samples(self, name, **labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            yield f"{name}_bucket{_labels(**labels, le=bound)}", cumulative
+        yield f"{name}_sum{_labels(**labels)}", self.sum
+        yield f"{name}_count{_labels(**labels)}", cumulative
+
+
+class ApiMetrics:
+    """
+    Request and ERP call metrics of the API, rendered in the Prometheus text format.
+
+    Recording a request or an ERP call takes one lock, a dict lookup and a bisect, so it
+    costs about a microsecond. Statistics kept elsewhere, like the response cache's
+    counters, are read by collectors only when the metrics are rendered.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.requests = {}  # (route, method) -> Histogram
+        self.responses = {}  # (route, method, status) -> count
+        self.erp_calls = {}  # endpoint -> Histogram
+        self.erp_responses = {}  # (endpoint, status or "error") -> count
+        self.exceptions = {}  # exception class name -> count
+        self.collectors = []
+
+    def observe_request(self, route, method, status, seconds):
+        with self._lock:
+            histogram = self.requests.get((route, method))
+            if histogram is None:
+                histogram = self.requests[route, method] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            key = (route, method, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def observe_erp_call(self, path, status, seconds):
+        endpoint = erp_endpoint(path)
+        with self._lock:
+            histogram = self.erp_calls.get(endpoint)
+            if histogram is None:
+                histogram = self.erp_calls[endpoint] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            key = (endpoint, status)
+            self.erp_responses[key] = self.erp_responses.get(key, 0) + 1
+
+    def observe_exception(self, exception):
+        """Counts an exception that a handler turned into a 500, by its class."""
+        name = type(exception).__name__
+        with self._lock:
+            self.exceptions[name] = self.exceptions.get(name, 0) + 1
+
+    def timed_erp_call(self, path, call):
+        """Runs call(), an ERP request for path, recording its duration and status."""
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = call()
+            status = response.status_code
+            return response
+        finally:
+            self.observe_erp_call(path, status, time.perf_counter() - start)
+
+    def add_collector(self, collector):
+        """
+        Args:
+            collector: Function returning (name, kind, help text, samples) metric families
+                to render along with the API's own, samples being (labels, value) pairs;
+                a collector added twice is only rendered once
+        """
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def to_prometheus(self, prefix="erp_api"):
+        """Renders the metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            lines.extend(f"{prefix}_{name}{labels} {value}" for labels, value in samples)
+
+        def histograms(name, help_text, label, histograms):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            for key, histogram in sorted(histograms.items()):
+                labels = dict(zip(label, key if isinstance(key, tuple) else (key,)))
+                lines.extend(f"{prefix}_{sample} {value}" for sample, value in histogram.samples(name, **labels))
+
+        with self._lock:
+            requests = {key: self._copy(histogram) for key, histogram in self.requests.items()}
+            responses = dict(self.responses)
+            erp_calls = {key: self._copy(histogram) for key, histogram in self.erp_calls.items()}
+            erp_responses = dict(self.erp_responses)
+            exceptions = dict(self.exceptions)
+
+        histograms("request_duration_seconds", "Time spent serving each route.", ("route", "method"), requests)
+        metric("responses_total", "counter", "Responses sent, by route and status code.",
+               [(_labels(route=route, method=method, status=status), count)
+                for (route, method, status), count in sorted(responses.items(), key=str)])
+        histograms("erp_request_duration_seconds", "Time spent on ERP calls, retries included, by endpoint.",
+                   ("endpoint",), erp_calls)
+        metric("erp_responses_total", "counter", "ERP calls by endpoint and status code, or error if none came back.",
+               [(_labels(endpoint=endpoint, status=status), count)
+                for (endpoint, status), count in sorted(erp_responses.items(), key=str)])
+        metric("exceptions_total", "counter", "Exceptions turned into 500 responses, by class.",
+               [(_labels(exception=name), count) for name, count in sorted(exceptions.items())])
+        for collector in self.collectors:
+            for name, kind, help_text, samples in collector():
+                metric(name, kind, help_text, samples)
+        return "\n".join(lines) + "\n"
+
+    def _copy(self, histogram):
+        copy = Histogram(histogram.buckets)
+        copy.counts = list(histogram.counts)
+        copy.sum = histogram.sum
+        return copy
+
+
+def cache_metrics(stats):
+    """
+    Args:
+        stats: TtlCache.stats() of the ERP response cache
+
+    Returns:
+        Its metric families, for an ApiMetrics collector
+    """
+    return [
+        ("cache_lookups_total", "counter", "ERP response cache lookups, by result.",
+         [(_labels(result=result), stats[result]) for result in ("hits", "stale_hits", "coalesced", "misses")]),
+        ("cache_evictions_total", "counter", "ERP responses evicted from the cache.", [("", stats["evictions"])]),
+        ("cache_refresh_errors_total", "counter", "Failed background refreshes of stale ERP responses.",
+         [("", stats["refresh_errors"])]),
+        ("cache_entries", "gauge", "ERP responses in the cache.", [("", stats["size"])]),
+        ("cache_fallbacks_total", "counter", "Cached ERP responses served because the ERP could not answer.",
+         [("", stats.get("fallbacks", 0))]),
+    ]
+
+
+def resilience_metrics(stats):
+    """
+    Args:
+        stats: ResilientErpClient.stats()
+
+    Returns:
+        Its metric families, for an ApiMetrics collector
+    """
+    breakers = sorted(stats["breakers"].items())
+    return [
+        ("circuit_state", "gauge", "State of each ERP endpoint's circuit breaker (1 for the current state).",
+         [(_labels(endpoint=endpoint, state=state), int(breaker["state"] == state))
+          for endpoint, breaker in breakers for state in CIRCUIT_STATES]),
+        ("circuit_opened_total", "counter", "Times each ERP endpoint's circuit breaker opened.",
+         [(_labels(endpoint=endpoint), breaker["opened"]) for endpoint, breaker in breakers]),
+        ("circuit_rejections_total", "counter", "ERP calls failed fast by an open circuit breaker.",
+         [(_labels(endpoint=endpoint), breaker["rejections"]) for endpoint, breaker in breakers]),
+        ("erp_hedges_total", "counter", "Hedged second requests sent to the ERP.", [("", stats["hedges"])]),
+        ("erp_hedge_wins_total", "counter", "Hedged requests answered before the first.", [("", stats["hedge_wins"])]),
+    ]
+
+
+# Metrics shared by the API and its ERP clients
+registry = ApiMetrics()
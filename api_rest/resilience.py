@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import deque
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker over the outcomes of the last `window` calls to one upstream.
+
+    It opens once at least min_calls are in the window and failed or slow calls (slower
+    than slow_call_seconds) make up failure_ratio of them. While open, calls fail fast
+    with CircuitOpenError. After open_seconds it lets a single probe call through
+    (half-open): a good probe closes the breaker, a bad one opens it again.
+    """
+
+    def __init__(self, name, failure_ratio=0.5, slow_call_seconds=2.0, window=20, min_calls=10, open_seconds=5.0,
+                 clock=time.monotonic):
+        self.name = name
+        self.failure_ratio = failure_ratio
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)  # True for a failed or slow call
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.rejections = 0
+
+    def before_call(self):
+        """Raises CircuitOpenError if the call must not go ahead."""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self._opened_at < self.open_seconds:
+                    self.rejections += 1
+                    raise CircuitOpenError(f"ERP {self.name} circuit is open")
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    self.rejections += 1
+                    raise CircuitOpenError(f"ERP {self.name} circuit is half-open, waiting on a probe call")
+                self._probing = True
+
+    def record(self, failed, seconds):
+        """Records the outcome of a call that before_call let through."""
+        bad = failed or seconds > self.slow_call_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if bad:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    self._failures = 0
+                return
+            if self.state == OPEN:
+                # A call that started before the breaker opened
+                return
+            if len(self._outcomes) == self._outcomes.maxlen:
+                self._failures -= self._outcomes[0]
+            self._outcomes.append(bad)
+            self._failures += bad
+            if len(self._outcomes) >= self.min_calls and self._failures >= self.failure_ratio * len(self._outcomes):
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = self.clock()
+        self.opened += 1
+
+
+class LatencyWindow:
+    """
+    Latencies of the last `size` calls to one upstream, and a percentile of them,
+    recomputed every `refresh` calls rather than on every read.
+    """
+
+    def __init__(self, percentile=95, size=200, min_samples=20, refresh=20):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=size)
+        self._pending = 0
+        self.value = None  # None until min_samples calls were seen
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self._pending += 1
+            if self._pending >= self.refresh and len(self._samples) >= self.min_samples:
+                ordered = sorted(self._samples)
+                self.value = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+                self._pending = 0
@@ -0,0 +1,56 @@
+import os
+
+from api_rest.geo import TechnicianIndexCache
+
+# Spatial index of the technician roster, rebuilt when the roster changes
+technician_indexes = TechnicianIndexCache()
+DEFAULT_TECHNICIANS = 2
+MAX_TECHNICIANS = int(os.environ.get("MAX_TECHNICIANS", 100))
+
+# Rank technicians while the roster streams in instead, keeping O(k) memory per request;
+# for rosters too large or changing too often to index
+STREAM_TECHNICIANS = os.environ.get("STREAM_TECHNICIANS", "0") == "1"
+ROSTER_CHUNK_SIZE = 1 << 16
+
+
+# Validate a nearest-technicians query
+def parse_technician_query(args):
+    """
+    Parses the lat, lon, k and max_km query parameters.
+
+    Args:
+        args: The request's query parameters
+
+    Returns:
+        The (lat, lon, k, max_km) query and None, or None and the error message for a 400
+    """
+    lat = args.get("lat")
+    lon = args.get("lon")
+
+    if not lat or not lon:
+        return None, "Parameters 'lat' and 'lon' are required"
+
+    try:
+        lat, lon = float(lat), float(lon)
+    except ValueError:
+        return None, "Coordinates 'lat' and 'lon' must be valid numbers"
+
+    try:
+        k = int(args.get("k", DEFAULT_TECHNICIANS))
+        max_km = args.get("max_km")
+        max_km = float(max_km) if max_km is not None else None
+    except ValueError:
+        return None, "Parameter 'k' must be an integer and 'max_km' a number"
+
+    if not 1 <= k <= MAX_TECHNICIANS:
+        return None, f"Parameter 'k' must be between 1 and {MAX_TECHNICIANS}"
+    if max_km is not None and not max_km >= 0:
+        return None, "Parameter 'max_km' must not be negative"
+
+    return (lat, lon, k, max_km), None
+
+
+def technician_metrics():
+    """Reads the technician index counters when the metrics are scraped, for an ApiMetrics collector."""
+    return [("technician_index_builds_total", "counter", "Technician indexes built for a new roster.",
+             [("", technician_indexes.builds)])]
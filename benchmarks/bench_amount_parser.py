@@ -0,0 +1,71 @@
+"""
+Amount parsing throughput: AmountParser against the regex parse_amount it replaced.
+
+Amounts mix JSON numbers, plain numeric strings and formatted strings in US and
+European notation, drawn from a catalogue of prices as in the nightly exports.
+
+Usage:
+    python -m benchmarks.bench_amount_parser --amounts 5000000
+"""
+import argparse
+import random
+import re
+import time
+
+from data_transformation.main import AmountParser
+
+
+def legacy_parse_amount(amount_str):
+    amount_str = re.sub(r'[^0-9.]', '', str(amount_str))
+    try:
+        return float(amount_str)
+    except ValueError:
+        return 0.0
+
+
+def generate_amounts(count, catalogue_size=2000, seed=42):
+    """30% JSON numbers, 30% plain strings, 25% "1,200.50€" style, 10% "€1.500,75" and 5% "1 250.50 EUR"."""
+    rng = random.Random(seed)
+    prices = [round(rng.uniform(1, 5000), 2) for _ in range(catalogue_size)]
+    amounts = []
+    for _ in range(count):
+        price, roll = rng.choice(prices), rng.random()
+        if roll < 0.30:
+            amounts.append(price)
+        elif roll < 0.60:
+            amounts.append(f"{price:.2f}")
+        elif roll < 0.85:
+            amounts.append(f"{price:,.2f}€")
+        elif roll < 0.95:
+            amounts.append("€" + f"{price:,.2f}".replace(",", " ").replace(".", ",").replace(" ", "."))
+        else:
+            amounts.append(f"{price:,.2f} EUR".replace(",", " "))
+    return amounts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--amounts", type=int, default=5_000_000)
+    args = parser.parse_args()
+
+    amounts = generate_amounts(args.amounts)
+
+    start = time.perf_counter()
+    legacy = [legacy_parse_amount(a) for a in amounts]
+    legacy_seconds = time.perf_counter() - start
+
+    amount_parser = AmountParser()
+    start = time.perf_counter()
+    parsed = [amount_parser(a) for a in amounts]
+    parser_seconds = time.perf_counter() - start
+
+    # The regex misreads European amounts ("1.500,75" -> 1.50075); count where they differ
+    differences = sum(old != new for old, new in zip(legacy, parsed))
+    print(f"regex parse_amount: {args.amounts / legacy_seconds:12,.0f} amounts/s ({legacy_seconds:.2f} s)")
+    print(f"AmountParser:       {args.amounts / parser_seconds:12,.0f} amounts/s ({parser_seconds:.2f} s)")
+    print(f"speedup: {legacy_seconds / parser_seconds:.1f}x; {differences:,} amounts parsed differently "
+          f"(European notation)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Load test of the ERP integration API against the local fake ERP, reporting p50/p99
+latency with a fresh connection per ERP call (as before ErpClient), with the pooled
+keep-alive client and with ERP responses cached on top of it.
+
+The fake ERP serves plain HTTP, so the numbers leave out the TLS handshakes that the
+unpooled client also paid against the real ERP on every call.
+
+Usage:
+    python -m benchmarks.bench_api_latency --requests 2000 --concurrency 16 --latency-ms 5
+"""
+import argparse
+import logging
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import make_server
+
+from api_rest import main as api
+from api_rest.erp_client import CachedErpClient, ErpClient
+from api_rest.fake_erp import FakeErp
+
+PATHS = [
+    "/api/products?part_id=1",
+    "/api/products?part_id=2",
+    "/api/products?part_id=4",
+    "/api/products?part_id=33",
+    "/api/technicians/nearest?lat=54&lon=34",
+]
+
+
+class UnpooledClient:
+    """A new connection for every ERP call, as the API made with requests.get."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def get(self, path):
+        return requests.get(f"{self.base_url}{path}")
+
+
+def percentile(latencies, p):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+
+def run_load(api_url, count, concurrency):
+    local = requests.Session()
+
+    def call(i):
+        start = time.perf_counter()
+        local.get(f"{api_url}{PATHS[i % len(PATHS)]}")
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        start = time.perf_counter()
+        latencies = sorted(pool.map(call, range(count)))
+        elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Delay added by the fake ERP per call")
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    erp_server = FakeErp(latency=args.latency_ms / 1000)
+    erp_url = erp_server.start()
+    api_server = make_server("127.0.0.1", 0, api.app, threaded=True)
+    api_url = f"http://127.0.0.1:{api_server.server_port}"
+    api_server_thread = ThreadPoolExecutor(1)
+    api_server_thread.submit(api_server.serve_forever)
+
+    clients = {
+        "unpooled": UnpooledClient(erp_url),
+        "pooled": ErpClient(erp_url, pool_size=args.concurrency),
+        "cached": CachedErpClient(ErpClient(erp_url, pool_size=args.concurrency)),
+    }
+    try:
+        for name, client in clients.items():
+            api.erp = client
+            connections = erp_server.connections
+            latencies, elapsed = run_load(api_url, args.requests, args.concurrency)
+            print(f"{name:>9}: p50 {percentile(latencies, 50) * 1000:7.2f} ms  "
+                  f"p99 {percentile(latencies, 99) * 1000:7.2f} ms  "
+                  f"mean {statistics.fmean(latencies) * 1000:7.2f} ms  "
+                  f"{args.requests / elapsed:8,.0f} req/s  "
+                  f"ERP connections: {erp_server.connections - connections}")
+    finally:
+        api_server.shutdown()
+        api_server_thread.shutdown()
+        erp_server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Overhead of the API's request and ERP call metrics.
+
+Times recording one observation into ApiMetrics, the Flask before/after request hooks
+around every request, and the timing wrapped around each ERP call, against the fake ERP.
+Whole requests through the test client vary by tens of microseconds between runs,
+which would drown the difference, so the pieces are timed on their own.
+
+Usage:
+    python -m benchmarks.bench_api_metrics --calls 100000
+"""
+import argparse
+import time
+
+from flask import Response
+
+from api_rest import main as api
+from api_rest.erp_client import ErpClient
+from api_rest.fake_erp import FakeErp
+from api_rest.metrics import ApiMetrics
+
+
+def time_per_call(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--erp-calls", type=int, default=3000)
+    args = parser.parse_args()
+
+    metrics = ApiMetrics()
+    observe_request = time_per_call(lambda: metrics.observe_request("/api/products", "GET", 200, 0.003), args.calls)
+    observe_erp_call = time_per_call(lambda: metrics.observe_erp_call("/parts/1", 200, 0.003), args.calls)
+    print(f"observe_request:      {observe_request * 1e6:7.2f} us")
+    print(f"observe_erp_call:     {observe_erp_call * 1e6:7.2f} us")
+
+    response = Response("{}")
+    with api.app.test_request_context("/api/products?part_id=1"):
+        def hooks():
+            api.start_request_timer()
+            api.record_request(response)
+        print(f"Flask request hooks:  {time_per_call(hooks, args.calls) * 1e6:7.2f} us")
+
+    erp_server = FakeErp()
+    url = erp_server.start()
+    try:
+        plain, timed = ErpClient(url, metrics=None), ErpClient(url, metrics=metrics)
+        runs = [(time_per_call(lambda: plain.get("/parts/1"), args.erp_calls),
+                 time_per_call(lambda: timed.get("/parts/1"), args.erp_calls)) for _ in range(3)]
+    finally:
+        erp_server.stop()
+    plain, timed = min(run[0] for run in runs), min(run[1] for run in runs)
+    print(f"ERP call untimed:     {plain * 1e6:7.1f} us")
+    print(f"ERP call timed:       {timed * 1e6:7.1f} us  ({(timed - plain) * 1e6:+.1f} us)")
+
+
+if __name__ == "__main__":
+    main()
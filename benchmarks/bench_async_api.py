@@ -0,0 +1,136 @@
+"""
+Throughput of the Flask API against its asyncio serving mode, in front of a slow
+simulated ERP.
+
+The fake ERP, the API under test and the load generator each run in their own
+process. The load generator keeps --concurrency requests in flight and reports
+throughput and p50/p99 latency. --flask-threads bounds the Flask server like a
+deployment with that many sync workers; 0 spawns a thread per request.
+
+Usage:
+    python -m benchmarks.bench_async_api --requests 5000 --concurrency 500 --latency-ms 100
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+
+import aiohttp
+import requests
+
+HOST = "127.0.0.1"
+ERP_PORT = 18081
+API_PORT = 18080
+PATHS = [
+    "/api/products?part_id=1",
+    "/api/products?part_id=2",
+    "/api/products?part_id=33",
+    "/api/technicians/nearest?lat=54&lon=34",
+]
+
+
+def serve_fake_erp(latency):
+    from api_rest.fake_erp import FakeErp
+    FakeErp(HOST, ERP_PORT, latency=latency).serve_forever()
+
+
+def serve_flask(threads):
+    from werkzeug.serving import make_server
+    from api_rest import main as api
+    from api_rest.erp_client import ErpClient
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    api.erp = ErpClient(f"http://{HOST}:{ERP_PORT}", pool_size=max(threads, 64))
+    server = make_server(HOST, API_PORT, api.app, threaded=True)
+    if threads:
+        # Hand requests to a fixed pool instead of a thread each, like N sync workers
+        pool = ThreadPoolExecutor(threads)
+        server.process_request = lambda request, address: pool.submit(
+            ThreadingMixIn.process_request_thread, server, request, address)
+    server.serve_forever()
+
+
+def serve_async():
+    from aiohttp import web
+    from api_rest.async_main import AsyncErpClient, create_app
+
+    web.run_app(create_app(AsyncErpClient(f"http://{HOST}:{ERP_PORT}")), host=HOST, port=API_PORT,
+                backlog=4096, print=None, access_log=None)
+
+
+def wait_for(url, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.05)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def run_load(count, concurrency):
+    latencies = []
+    failures = 0
+    queue = iter(range(count))
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60)) as session:
+
+        async def worker():
+            nonlocal failures
+            for i in queue:
+                start = time.perf_counter()
+                try:
+                    async with session.get(f"http://{HOST}:{API_PORT}{PATHS[i % len(PATHS)]}") as response:
+                        await response.read()
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    failures += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return sorted(latencies), elapsed, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="Delay added by the fake ERP per call")
+    parser.add_argument("--flask-threads", type=int, default=16)
+    args = parser.parse_args()
+
+    erp = multiprocessing.Process(target=serve_fake_erp, args=(args.latency_ms / 1000,), daemon=True)
+    erp.start()
+    wait_for(f"http://{HOST}:{ERP_PORT}/stock/A05")
+
+    servers = {
+        f"flask ({args.flask_threads or 'unbounded'} threads)": (serve_flask, (args.flask_threads,)),
+        "asyncio": (serve_async, ()),
+    }
+    try:
+        for name, (target, target_args) in servers.items():
+            server = multiprocessing.Process(target=target, args=target_args, daemon=True)
+            server.start()
+            try:
+                wait_for(f"http://{HOST}:{API_PORT}/api/products")
+                latencies, elapsed, failures = asyncio.run(run_load(args.requests, args.concurrency))
+            finally:
+                server.terminate()
+                server.join()
+            print(f"{name:>24}: {len(latencies) / elapsed:8,.0f} req/s  "
+                  f"p50 {latencies[len(latencies) // 2] * 1000:8.1f} ms  "
+                  f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:8.1f} ms  "
+                  f"mean {statistics.fmean(latencies) * 1000:8.1f} ms  failures: {failures}")
+    finally:
+        erp.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Throughput of the ingestion backends on synthetic input cycled from the sample records,
+including the parallel backend at several worker counts.
+
+Usage:
+    python -m benchmarks.bench_backends --records 1000000 --workers 1 2 4 8
+"""
+import argparse
+import filecmp
+import json
+import logging
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+from data_transformation.main import ConfigLoader, parse_json_to_csv
+from data_transformation.columnar import parse_json_to_csv_columnar
+from data_transformation.parallel import parse_json_to_csv_parallel
+
+CONFIG_FILE = Path("data_transformation/config.yml")
+SAMPLE_FILE = Path("data_transformation/inputs/records.json")
+
+
+def load_records(count):
+    with SAMPLE_FILE.open("r", encoding="utf-8") as f:
+        samples = json.load(f)
+    return [samples[i % len(samples)] for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    records = load_records(args.records)
+    backends = {
+        "rows": parse_json_to_csv,
+        "columnar": parse_json_to_csv_columnar,
+    }
+    for workers in args.workers:
+        backends[f"parallel-{workers}"] = partial(parse_json_to_csv_parallel, workers=workers)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        for name, backend in backends.items():
+            config = ConfigLoader(CONFIG_FILE)
+            start = time.perf_counter()
+            backend(records, tmp_dir / f"transactions_{name}.csv", tmp_dir / f"details_{name}.csv", config)
+            elapsed = time.perf_counter() - start
+            identical = all(filecmp.cmp(tmp_dir / f"{kind}_rows.csv", tmp_dir / f"{kind}_{name}.csv", shallow=False)
+                            for kind in ("transactions", "details"))
+            print(f"{name:>12}: {elapsed:8.2f} s  {args.records / elapsed:10,.0f} records/s  "
+                  f"matches rows: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Polling many parts: one /api/products call per part against a single
+/api/products/batch call, in front of the fake ERP with a fixed latency per call.
+
+The ERP responses are not cached, so every call in the comparison reaches the ERP.
+
+Usage:
+    python -m benchmarks.bench_batch_products --parts 200 --latency-ms 20
+"""
+import argparse
+import time
+
+from api_rest import main as api
+from api_rest.erp_client import ErpClient
+from api_rest.fake_erp import FakeErp
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parts", type=int, default=200)
+    parser.add_argument("--types", type=int, default=10, help="Distinct stock types across the parts")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    parts = {str(i): {"part_id": str(i), "type": f"T{i % args.types:02d}", "status": "ok"}
+             for i in range(1, args.parts + 1)}
+    stock = {f"T{i:02d}": i for i in range(args.types)}
+    erp_server = FakeErp(latency=args.latency_ms / 1000, parts=parts, stock=stock)
+    api.erp = ErpClient(erp_server.start(), pool_size=api.BATCH_CONCURRENCY)
+    client = api.app.test_client()
+    part_ids = list(parts)
+
+    try:
+        start = time.perf_counter()
+        singles = [client.get("/api/products", query_string={"part_id": part_id}).get_json() for part_id in part_ids]
+        singles_seconds = time.perf_counter() - start
+        singles_calls = erp_server.requests
+
+        start = time.perf_counter()
+        batch = client.post("/api/products/batch", json={"part_ids": part_ids}).get_json()
+        batch_seconds = time.perf_counter() - start
+        batch_calls = erp_server.requests - singles_calls
+    finally:
+        erp_server.stop()
+
+    assert [result["product"] for result in batch["results"]] == singles
+    print(f"{args.parts} single calls: {singles_seconds:7.2f} s  {singles_calls:5} ERP calls")
+    print(f"one batch call:   {batch_seconds:7.2f} s  {batch_calls:5} ERP calls")
+    print(f"speedup: {singles_seconds / batch_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Date parsing throughput: DateParser against the strptime loop it replaced.
+
+Most dates use one or two formats, as in the nightly exports.
+
+Usage:
+    python -m benchmarks.bench_date_parser --dates 10000000
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from data_transformation.main import ConfigLoader, DateParser, clean_string
+
+CONFIG_FILE = Path("data_transformation/config.yml")
+
+
+def legacy_parse_date(date_str, date_formats):
+    date_str = clean_string(date_str)
+    for fmt in date_formats:
+        try:
+            return datetime.strptime(date_str, fmt).date()
+        except ValueError:
+            continue
+    return date.today()
+
+
+def generate_dates(count, seed=42):
+    """Three years of dates, 70% in "%d/%m/%Y", 25% ISO and 5% spread over the other formats."""
+    rng = random.Random(seed)
+    start = date(2022, 1, 1)
+    days = [start + timedelta(days=i) for i in range(3 * 365)]
+    rare_formats = ["%d/%m/%y", "%d-%m-%y", "%Y.%m.%d", "%Y/%m/%d", "%d-%m-%Y", "%B %d, %Y"]
+    dates = []
+    for _ in range(count):
+        day, roll = rng.choice(days), rng.random()
+        if roll < 0.70:
+            dates.append(day.strftime("%d/%m/%Y"))
+        elif roll < 0.95:
+            dates.append(day.isoformat())
+        else:
+            dates.append(day.strftime(rng.choice(rare_formats)))
+    return dates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dates", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    date_formats = ConfigLoader(CONFIG_FILE).get("date_formats")
+    dates = generate_dates(args.dates)
+
+    start = time.perf_counter()
+    legacy = [legacy_parse_date(d, date_formats) for d in dates]
+    legacy_seconds = time.perf_counter() - start
+
+    date_parser = DateParser(date_formats)
+    start = time.perf_counter()
+    parsed = [date_parser(d) for d in dates]
+    parser_seconds = time.perf_counter() - start
+
+    assert parsed == legacy, "DateParser results differ from the strptime loop"
+    print(f"strptime loop: {args.dates / legacy_seconds:12,.0f} dates/s ({legacy_seconds:.2f} s)")
+    print(f"DateParser:    {args.dates / parser_seconds:12,.0f} dates/s ({parser_seconds:.2f} s)")
+    print(f"speedup: {legacy_seconds / parser_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
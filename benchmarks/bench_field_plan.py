@@ -0,0 +1,93 @@
+"""
+Microbenchmark of field resolution: the compiled FieldResolutionPlan against the
+per-record config lookups the pipeline used to do.
+
+The sample records all have different key shapes. They are timed both interleaved
+(every record a new shape, the plan's worst case) and grouped by shape, as records
+arrive from one source at a time. The legacy lookups only try the first alias of
+each field, so they do less work than the plan on records using other aliases; the
+last run only has records keyed by the first aliases.
+
+Usage:
+    python -m benchmarks.bench_field_plan --records 1000000
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from data_transformation.main import ConfigLoader
+
+CONFIG_FILE = Path("data_transformation/config.yml")
+SAMPLE_FILE = Path("data_transformation/inputs/records.json")
+
+
+def legacy_resolve(entry, config):
+    return (
+        entry.get(config.get('id_fields')[0], 0),
+        entry.get(config.get('name_fields')[0], ''),
+        entry.get(config.get('date_fields')[0], ''),
+        entry.get(config.get('amount_fields')[0], 0),
+        entry.get(config.get('status_fields')[0], 'Unknown'),
+    )
+
+
+def scan_resolve(entry, config):
+    """Tries every alias of every field on each record, re-reading the config each time."""
+    values = []
+    for key, default in (('id_fields', 0), ('name_fields', ''), ('date_fields', ''),
+                         ('amount_fields', 0), ('status_fields', 'Unknown')):
+        for alias in config.get(key):
+            value = entry
+            for part in alias.split('.'):
+                value = value.get(part) if isinstance(value, dict) else None
+            if value is not None:
+                break
+        values.append(default if value is None else value)
+    return tuple(values)
+
+
+def timed(resolve, records, config=None):
+    start = time.perf_counter()
+    if config is None:
+        for entry in records:
+            resolve(entry)
+    else:
+        for entry in records:
+            resolve(entry, config)
+    return (time.perf_counter() - start) / len(records) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    config = ConfigLoader(CONFIG_FILE)
+    with SAMPLE_FILE.open("r", encoding="utf-8") as f:
+        samples = json.load(f)
+    orders = {
+        "interleaved shapes": [samples[i % len(samples)] for i in range(args.records)],
+        "grouped by shape": [samples[i * len(samples) // args.records] for i in range(args.records)],
+        # The one sample the legacy lookups resolve in full, so both do the same work
+        "first aliases only": [samples[0]] * args.records,
+    }
+
+    for name, records in orders.items():
+        # Best of interleaved runs: timings drift by tens of percent on a busy machine
+        legacy = scan = planned = float("inf")
+        for _ in range(args.repeat):
+            legacy = min(legacy, timed(legacy_resolve, records, config))
+            scan = min(scan, timed(scan_resolve, records, config))
+            planned = min(planned, timed(config.field_plan.resolve, records))
+
+        print(f"{name}:")
+        print(f"  legacy first-alias lookups: {legacy:8.0f} ns/record")
+        print(f"  per-record alias scan:      {scan:8.0f} ns/record")
+        print(f"  compiled plan:              {planned:8.0f} ns/record "
+              f"({scan / planned:.2f}x faster than the scan, {planned / legacy:.2f}x the cost of legacy lookups)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Memory and latency of one nearest-technicians query over a large roster: parsing the
+whole /technicians/available body and ranking every technician, against streaming it
+through JsonArrayDecoder into a bounded top-k heap.
+
+Peak memory is measured with tracemalloc and excludes the raw body, which the
+streaming path never holds in full when reading from the network.
+
+Usage:
+    python -m benchmarks.bench_roster_streaming --technicians 200000 --k 2
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from api_rest.fake_erp import generate_roster
+from api_rest.geo import NearestTechnicians
+from api_rest.main import nearest_technicians
+from api_rest.technicians import ROSTER_CHUNK_SIZE
+from data_transformation.streaming import JsonArrayDecoder
+
+
+def parse_whole(body, lat, lon, k):
+    return nearest_technicians(json.loads(body), lat, lon, k)
+
+
+def parse_streaming(body, lat, lon, k):
+    decoder = JsonArrayDecoder()
+    nearest = NearestTechnicians(lat, lon, k)
+    for start in range(0, len(body), ROSTER_CHUNK_SIZE):
+        nearest.add(decoder.feed(body[start:start + ROSTER_CHUNK_SIZE]))
+    nearest.add(decoder.close())
+    return nearest.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--technicians", type=int, default=200_000)
+    parser.add_argument("--k", type=int, default=2)
+    args = parser.parse_args()
+
+    body = json.dumps(generate_roster(args.technicians)).encode("utf-8")
+    print(f"roster: {args.technicians:,} technicians, {len(body) / 1e6:.1f} MB body")
+
+    results = {}
+    for name, query in (("json() + sort", parse_whole), ("streaming top-k", parse_streaming)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        results[name] = query(body, 48.85, 2.35, args.k)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:>16}: {elapsed * 1000:8.0f} ms  peak {peak / 1e6:8.2f} MB")
+
+    assert len(set(map(json.dumps, results.values()))) == 1, "Streaming results differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Write time and file size of each output sink for the details rows of a synthetic export.
+
+Usage:
+    python -m benchmarks.bench_sinks --records 1000000
+"""
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from data_transformation.main import ConfigLoader, ItemDetail
+from data_transformation.columnar import transform_batch
+from data_transformation.sinks import SINKS, open_sink
+from benchmarks.bench_backends import CONFIG_FILE, load_records
+
+SUFFIXES = {"csv": ".csv", "csv.gz": ".csv.gz", "csv.zst": ".csv.zst", "arrow": ".arrow", "parquet": ".parquet"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    _, rows = transform_batch(load_records(args.records), ConfigLoader(CONFIG_FILE))
+    print(f"{len(rows)} detail rows")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in SINKS:
+            path = Path(tmp) / f"details{SUFFIXES[fmt]}"
+            start = time.perf_counter()
+            with open_sink(path, ItemDetail) as sink:
+                sink.write_many(rows)
+            elapsed = time.perf_counter() - start
+            print(f"{fmt:>8}: {elapsed:7.2f} s  {path.stat().st_size / 2**20:8.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Refreshing the SQL report tables incrementally against rebuilding them, after a batch
+of new orders lands in a database with a long order history.
+
+The database is generated as in bench_sql_reports and indexed with optimize_schema();
+each round appends --new-orders orders, refreshes every report incrementally, checks
+that the result is identical to a full rebuild and times both.
+
+Usage:
+    python -m benchmarks.bench_sql_incremental --orders 1000000 --new-orders 1000 --rounds 3
+"""
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from benchmarks.bench_sql_reports import STATUSES, build_database
+from sql_queries import solution
+
+# Report table and the number of leading columns identifying a row
+REPORTS = {
+    solution.get_top_selling_products: ("TopSellingProducts", 2),
+    solution.get_customer_sales_performance: ("CustomerSalesPerformance", 1),
+    solution.get_sales_forecast: ("SalesForecast", 1),
+    solution.get_discount_analysis: ("DiscountAnalysis", 1),
+}
+
+
+def append_orders(db_file, count, rng):
+    """Adds count recent orders with 1 to 5 details each, numbered after the existing ones."""
+    conn = sqlite3.connect(db_file)
+    try:
+        order_id, detail_id, customers, products = conn.execute(
+            "SELECT (SELECT MAX(order_id) FROM Orders), (SELECT MAX(order_detail_id) FROM OrderDetails), "
+            "(SELECT MAX(customer_id) FROM Customers), (SELECT MAX(product_id) FROM Products)").fetchone()
+        today = date.today()
+        with conn:
+            for order_id in range(order_id + 1, order_id + 1 + count):
+                ordered = today - timedelta(days=rng.randrange(7))
+                conn.execute("INSERT INTO Orders (order_id, customer_id, order_date, status) VALUES (?, ?, ?, ?)",
+                             (order_id, rng.randint(1, customers), ordered.isoformat(), rng.choice(STATUSES)))
+                for _ in range(rng.randint(1, 5)):
+                    detail_id += 1
+                    quantity = rng.randint(1, 20)
+                    conn.execute("INSERT INTO OrderDetails VALUES (?, ?, ?, ?, ?)",
+                                 (detail_id, order_id, rng.randint(1, products), quantity,
+                                  round(quantity * rng.uniform(10, 2000), 2)))
+    finally:
+        conn.close()
+
+
+def rows(db_file, table, key_columns):
+    return {row[:key_columns]: row for row in solution.get_db_connection(db_file).execute(f"SELECT * FROM {table}")}
+
+
+def first_difference(refreshed, rebuilt):
+    """Describes the first row that differs between the two, or returns None if they are identical."""
+    if refreshed.keys() != rebuilt.keys():
+        return f"{len(refreshed.keys() ^ rebuilt.keys())} rows are in only one of the two"
+    for key, row in refreshed.items():
+        if row != rebuilt[key]:
+            return f"{row} against {rebuilt[key]}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=50000)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--new-orders", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = str(Path(tmp) / "erp.db")
+        start = time.perf_counter()
+        details = build_database(db_file, args.customers, args.products, args.orders)
+        solution.optimize_schema(db_file)
+        print(f"database: {args.orders:,} orders, {details:,} order details "
+              f"(built and indexed in {time.perf_counter() - start:.1f} s)")
+
+        best = {(report, incremental): float("inf") for report in REPORTS for incremental in (False, True)}
+        checked = 0
+        try:
+            start = time.perf_counter()
+            for report in REPORTS:
+                report(db_file, incremental=True)
+            print(f"first incremental refresh (aggregates from the full history): {time.perf_counter() - start:.1f} s")
+
+            for _ in range(args.rounds):
+                append_orders(db_file, args.new_orders, rng)
+                for report, (table, key_columns) in REPORTS.items():
+                    start = time.perf_counter()
+                    report(db_file, incremental=True)
+                    best[report, True] = min(best[report, True], time.perf_counter() - start)
+                    refreshed = rows(db_file, table, key_columns)
+                    start = time.perf_counter()
+                    report(db_file)
+                    best[report, False] = min(best[report, False], time.perf_counter() - start)
+                    difference = first_difference(refreshed, rows(db_file, table, key_columns))
+                    if difference:
+                        raise SystemExit(f"{table}: the incremental refresh differs from a full rebuild: {difference}")
+                    checked += len(refreshed)
+        finally:
+            solution.pool.close()
+
+    print(f"rows checked against a full rebuild: {checked:,}, all identical")
+    print(f"\nafter each {args.new_orders:,} new orders (best of {args.rounds}):")
+    print(f"{'report':>32} {'full rebuild':>15} {'incremental':>15}  speedup")
+    for report in REPORTS:
+        full, incremental = best[report, False], best[report, True]
+        print(f"{report.__name__:>32} {full * 1000:12.1f} ms {incremental * 1000:12.1f} ms  {full / incremental:6.1f}x")
+    full, incremental = (sum(best[report, mode] for report in REPORTS) for mode in (False, True))
+    print(f"{'total':>32} {full * 1000:12.1f} ms {incremental * 1000:12.1f} ms  {full / incremental:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+SQL report builders on a scaled-up ERP database before and after optimize_schema():
+the query plan steps that read OrderDetails, Orders and Inventory, and the time of
+each report.
+
+The database is generated as in bench_sql_reports, in a temporary directory, and
+copied so that each variant has a file of its own.
+
+Usage:
+    python -m benchmarks.bench_sql_indexes --orders 1000000 --repeat 3
+    python -m benchmarks.bench_sql_indexes --orders 3300000 --repeat 1   # ~10M order details
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_sql_reports import REPORTS, build_database
+from sql_queries import solution
+
+TABLES = ("OrderDetails", "Orders", "Inventory", "od", "o", "i")
+
+
+def table_steps(db_file, report):
+    """The plan steps of a report that read one of TABLES."""
+    steps = []
+    for _, plan in solution.report_query_plans(db_file, report):
+        steps.extend(step for step in plan if step.split(" ")[:2][-1] in TABLES)
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=50000)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_db, indexed_db = str(Path(tmp) / "plain.db"), str(Path(tmp) / "indexed.db")
+        start = time.perf_counter()
+        details = build_database(plain_db, args.customers, args.products, args.orders)
+        print(f"database: {args.orders:,} orders, {details:,} order details "
+              f"(built in {time.perf_counter() - start:.1f} s)")
+        shutil.copy(plain_db, indexed_db)
+        start = time.perf_counter()
+        solution.optimize_schema(indexed_db)
+        print(f"optimize_schema: {time.perf_counter() - start:.1f} s")
+
+        variants = {"no indexes": plain_db, "covering indexes": indexed_db}
+        try:
+            for report in REPORTS:
+                print(f"\n{report.__name__}")
+                for name, db_file in variants.items():
+                    print(f"  {name}: {'; '.join(table_steps(db_file, report))}")
+
+            # Alternating the variants report by report, as in bench_sql_reports
+            best = {(name, report): float("inf") for name in variants for report in REPORTS}
+            for _ in range(args.repeat):
+                for report in REPORTS:
+                    for name, db_file in variants.items():
+                        start = time.perf_counter()
+                        report(db_file)
+                        best[name, report] = min(best[name, report], time.perf_counter() - start)
+        finally:
+            solution.pool.close()
+
+    print(f"\n{'report':>32} " + " ".join(f"{name:>18}" for name in variants) + "  speedup")
+    for report in REPORTS:
+        plain, indexed = (best[name, report] for name in variants)
+        print(f"{report.__name__:>32} {plain * 1000:15.1f} ms {indexed * 1000:15.1f} ms  {plain / indexed:6.2f}x")
+    plain, indexed = (sum(best[name, report] for report in REPORTS) for name in variants)
+    print(f"{'total':>32} {plain * 1000:15.1f} ms {indexed * 1000:15.1f} ms  {plain / indexed:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
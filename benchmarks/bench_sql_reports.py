@@ -0,0 +1,138 @@
+"""
+End-to-end time of the SQL report builders on a scaled-up copy of the ERP database:
+a fresh connection and commit per statement (as before the connection pool) against
+one pooled connection per report with the performance PRAGMAs.
+
+The database is generated from sql_queries/setup.sql plus synthetic customers,
+products, orders, order details and inventory, in a temporary directory.
+
+Usage:
+    python -m benchmarks.bench_sql_reports --orders 200000 --repeat 3
+"""
+import argparse
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+
+from sql_queries import solution
+
+SETUP_SQL = Path(__file__).resolve().parent.parent / "sql_queries" / "setup.sql"
+REPORTS = [
+    solution.get_top_selling_products,
+    solution.get_late_deliveries,
+    solution.get_customer_sales_performance,
+    solution.get_sales_forecast,
+    solution.get_discount_analysis,
+]
+CATEGORIES = ["Electrical", "Renewable Energy", "IoT", "Automation", "Cabling"]
+STATUSES = ["Pending", "Shipped", "Delivered", "Delivered", "Delivered", "Cancelled"]
+
+
+def build_database(path, customers, products, orders, seed=42):
+    """The setup.sql data plus synthetic rows numbered after it, about 3 details per order."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(SETUP_SQL.read_text())
+    conn.executemany("INSERT INTO Customers (customer_id, name, email, country) VALUES (?, ?, ?, ?)",
+                     ((i, f"Customer {i}", f"c{i}@example.com", "Spain") for i in range(100, 100 + customers)))
+    prices = {i: round(rng.uniform(10, 2000), 2) for i in range(100, 100 + products)}
+    conn.executemany("INSERT INTO Products (product_id, name, price, category) VALUES (?, ?, ?, ?)",
+                     ((i, f"Product {i}", price, rng.choice(CATEGORIES)) for i, price in prices.items()))
+    conn.executemany("INSERT INTO Inventory (inventory_id, product_id, warehouse_location, stock_quantity) "
+                     "VALUES (?, ?, ?, ?)",
+                     ((100 + n, i, f"Warehouse {n % 7}", rng.randrange(1000))
+                      for n, i in enumerate(list(prices) * 3)))
+
+    today = date.today()
+    order_rows, detail_rows = [], []
+    for order_id in range(1000, 1000 + orders):
+        ordered = today - timedelta(days=rng.randrange(365))
+        status = rng.choice(STATUSES)
+        delivered = ordered + timedelta(days=rng.randrange(1, 12)) if status == "Delivered" else None
+        order_rows.append((order_id, rng.randrange(100, 100 + customers), ordered.isoformat(),
+                           delivered.isoformat() if delivered else None, status))
+        for _ in range(rng.randint(1, 5)):
+            product_id = rng.randrange(100, 100 + products)
+            quantity = rng.randint(1, 20)
+            detail_rows.append((order_id, product_id, quantity,
+                                round(prices[product_id] * quantity * rng.uniform(0.8, 1.0), 2)))
+    conn.executemany("INSERT INTO Orders (order_id, customer_id, order_date, delivery_date, status) "
+                     "VALUES (?, ?, ?, ?, ?)", order_rows)
+    conn.executemany("INSERT INTO OrderDetails (order_detail_id, order_id, product_id, quantity, total_price) "
+                     "VALUES (?, ?, ?, ?, ?)", ((100 + n, *row) for n, row in enumerate(detail_rows)))
+    conn.commit()
+    conn.close()
+    return len(detail_rows)
+
+
+class UnpooledConnections:
+    """A new connection and a commit for every statement, without PRAGMAs, as before the pool."""
+
+    @contextmanager
+    def transaction(self, db_file):
+        conn = sqlite3.connect(db_file)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def connection(self, db_file):
+        # Only fetch_one asks for a bare connection; it is closed when collected
+        return sqlite3.connect(db_file)
+
+    def close(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        unpooled_db, pooled_db = str(Path(tmp) / "unpooled.db"), str(Path(tmp) / "pooled.db")
+        start = time.perf_counter()
+        details = build_database(unpooled_db, args.customers, args.products, args.orders)
+        print(f"database: {args.orders:,} orders, {details:,} order details "
+              f"(built in {time.perf_counter() - start:.1f} s)")
+        # A copy of its own, since WAL mode sticks to a database file once set
+        shutil.copy(unpooled_db, pooled_db)
+
+        pooled = solution.pool
+        variants = {
+            "connection per statement": (UnpooledConnections(), unpooled_db),
+            "pooled connection + PRAGMAs": (pooled, pooled_db),
+        }
+        # Best time of each report, alternating the variants report by report: on a busy
+        # machine, timing whole runs one after the other skews by 10% and more
+        best = {(name, report): float("inf") for name in variants for report in REPORTS}
+        try:
+            for _ in range(args.repeat):
+                for report in REPORTS:
+                    for name, (pool, db_file) in variants.items():
+                        solution.pool = pool
+                        start = time.perf_counter()
+                        report(db_file)
+                        best[name, report] = min(best[name, report], time.perf_counter() - start)
+        finally:
+            solution.pool = pooled
+            pooled.close()
+
+    totals = {name: sum(best[name, report] for report in REPORTS) for name in variants}
+    for name, seconds in totals.items():
+        print(f"{name:>28}: {seconds * 1000:8.1f} ms for {len(REPORTS)} reports (best of {args.repeat} each)")
+    baseline, pooled_total = totals.values()
+    print(f"speedup: {baseline / pooled_total:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Wall-clock time of a full refresh of the SQL reports: one report after another against
+run_reports(), which builds them concurrently on a thread pool and copies the results
+into the database one at a time.
+
+SQLite releases the GIL while it runs a statement, so the builders only overlap with
+more than one CPU core; the per-report times show how close the run gets to the
+slowest report. The database is generated as in bench_sql_reports and indexed with
+optimize_schema().
+
+Usage:
+    python -m benchmarks.bench_sql_runner --orders 200000 --repeat 3
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_sql_reports import build_database
+from sql_queries import solution
+
+
+def run_sequentially(db_file):
+    """The reports one after another, as the scheduler ran them, in the shape run_reports returns."""
+    results = {}
+    for report in [*solution.REPORT_TABLES, solution.get_late_deliveries]:
+        start = time.perf_counter()
+        results[report.__name__] = (report(db_file), time.perf_counter() - start, 0.0)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=50000)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--workers", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = str(Path(tmp) / "erp.db")
+        details = build_database(db_file, args.customers, args.products, args.orders)
+        solution.optimize_schema(db_file)
+        print(f"database: {args.orders:,} orders, {details:,} order details; {os.cpu_count()} CPU cores")
+
+        variants = {
+            "sequential": run_sequentially,
+            f"run_reports, {args.workers} workers": lambda db: solution.run_reports(db, args.workers),
+        }
+        best = {name: (float("inf"), None) for name in variants}
+        try:
+            for _ in range(args.repeat):
+                for name, run in variants.items():
+                    start = time.perf_counter()
+                    results = run(db_file)
+                    best[name] = min(best[name], (time.perf_counter() - start, results), key=lambda run: run[0])
+        finally:
+            solution.pool.close()
+
+    for name, (seconds, results) in best.items():
+        print(f"\n{name}: {seconds * 1000:.1f} ms wall clock (best of {args.repeat})")
+        for report, (_, built, copied) in results.items():
+            print(f"  {report:>32} {built * 1000:9.1f} ms" + (f" + {copied * 1000:.1f} ms copy" if copied else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compares the in-memory and streaming ingestion modes of the data transformation pipeline.
+
+Each mode runs in its own subprocess so that peak RSS is measured independently.
+
+Usage:
+    python -m benchmarks.bench_streaming --records 1000000
+"""
+import argparse
+import filecmp
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CONFIG_FILE = Path("data_transformation/config.yml")
+SAMPLE_FILE = Path("data_transformation/inputs/records.json")
+
+
+def generate_input(path: Path, records: int):
+    """Writes a JSON array of `records` entries cycled from the sample input."""
+    with SAMPLE_FILE.open("r", encoding="utf-8") as f:
+        samples = json.load(f)
+
+    with path.open("w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i in range(records):
+            if i:
+                f.write(",\n")
+            f.write(json.dumps(samples[i % len(samples)]))
+        f.write("\n]\n")
+
+
+def run_mode(mode: str, input_file: Path, output_dir: Path):
+    """Runs the pipeline once in this process and prints its timing and peak RSS as JSON."""
+    from data_transformation.main import ConfigLoader, iter_json_records, parse_json_to_csv
+
+    config = ConfigLoader(CONFIG_FILE)
+    start = time.perf_counter()
+    if mode == "stream":
+        json_data = iter_json_records(input_file)
+    else:
+        with input_file.open("r", encoding="utf-8") as f:
+            json_data = json.load(f)
+    transactions, _ = parse_json_to_csv(json_data, output_dir / f"transactions_{mode}.csv",
+                                        output_dir / f"details_{mode}.csv", config)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "mode": mode,
+        "seconds": elapsed,
+        "records_per_sec": transactions / elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--run-mode", choices=["load", "stream"], help=argparse.SUPPRESS)
+    parser.add_argument("--input", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--output-dir", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_mode(args.run_mode, args.input, args.output_dir)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        input_file = tmp_dir / "records.json"
+        generate_input(input_file, args.records)
+        print(f"Input: {args.records} records, {input_file.stat().st_size / 2**20:.1f} MiB")
+
+        for mode in ("load", "stream"):
+            result = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_streaming", "--run-mode", mode,
+                 "--input", str(input_file), "--output-dir", str(tmp_dir)],
+                check=True, capture_output=True, text=True,
+            )
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            print(f"{mode:>6}: {stats['seconds']:8.2f} s  {stats['records_per_sec']:10.0f} records/s  "
+                  f"peak RSS {stats['peak_rss_mb']:8.1f} MiB")
+
+        identical = all(filecmp.cmp(tmp_dir / f"{name}_load.csv", tmp_dir / f"{name}_stream.csv", shallow=False)
+                        for name in ("transactions", "details"))
+        print(f"Outputs byte-identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Nearest-technician query latency on a synthetic roster clustered around cities:
+ranking the whole roster with scalar haversine, the vectorized NumPy pass with
+argpartition, and the k-d tree, for several k.
+
+Usage:
+    python -m benchmarks.bench_technician_index --technicians 100000 --queries 1000 --k 2 50
+"""
+import argparse
+import random
+import time
+
+from api_rest import geo
+from api_rest.fake_erp import generate_roster
+from api_rest.geo import TechnicianIndex
+from api_rest.main import nearest_technicians
+
+# VECTORIZED_FRACTION values forcing either query path
+PATHS = {"vectorized": 10 ** 9, "k-d tree": 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--technicians", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, nargs="*", default=[2, 50])
+    args = parser.parse_args()
+
+    roster = generate_roster(args.technicians)
+    rng = random.Random(7)
+    queries = [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    index = TechnicianIndex(roster)
+    print(f"roster: {args.technicians:,} technicians, index built in {time.perf_counter() - start:.2f} s")
+
+    # The scalar ranking is slow; time it on a sample of the queries
+    sample = queries[:max(1, args.queries // 50)]
+    default_fraction = geo.VECTORIZED_FRACTION
+    for k in args.k:
+        start = time.perf_counter()
+        expected = [nearest_technicians(roster, lat, lon, k) for lat, lon in sample]
+        print(f"k={k:<4} scalar haversine + sort: {(time.perf_counter() - start) / len(sample) * 1000:9.3f} ms/query")
+
+        for name, fraction in PATHS.items():
+            geo.VECTORIZED_FRACTION = fraction
+            start = time.perf_counter()
+            results = [index.nearest(lat, lon, k) for lat, lon in queries]
+            elapsed = time.perf_counter() - start
+            assert results[:len(sample)] == expected, f"{name} results differ from the scalar ranking"
+            print(f"k={k:<4} {name + ':':<25} {elapsed / args.queries * 1000:9.3f} ms/query")
+        geo.VECTORIZED_FRACTION = default_fraction
+
+
+if __name__ == "__main__":
+    main()
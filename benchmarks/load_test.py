@@ -0,0 +1,240 @@
+"""
+Load generator for the API: sends a mix of /api/products and /api/technicians/nearest
+requests at a target rate and reports throughput and latency percentiles.
+
+Requests go out on schedule whether or not earlier ones have finished (an open loop),
+and each latency is measured from when its request was due, so a server falling
+behind shows up as queueing delay rather than as a quietly lower request rate. The
+request sequence is drawn from --seed, so runs are repeatable.
+
+Point it at a running API with --url, or let it start the fake ERP and the Flask or
+asyncio app in their own processes with --serve; the fake ERP options then shape the
+simulated ERP.
+
+Usage:
+    python -m benchmarks.load_test --serve flask --rps 100 --duration 10 --latency-ms 20
+    python -m benchmarks.load_test --serve async --rps 500 --error-rate 0.02 --technicians 20000
+    python -m benchmarks.load_test --url http://127.0.0.1:3000 --rps 50 --mix products=1 technicians=1
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import statistics
+from pathlib import Path
+
+import aiohttp
+
+from api_rest.fake_erp import FakeErp, generate_parts, generate_roster
+from benchmarks.bench_async_api import HOST, wait_for
+
+ERP_PORT = 18091
+API_PORT = 18090
+ENDPOINTS = ("products", "technicians")
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def serve_fake_erp(options, parts, technicians, seed):
+    parts, stock = generate_parts(parts, seed=seed)
+    roster = generate_roster(technicians, seed) if technicians else None
+    FakeErp(HOST, ERP_PORT, parts=parts, stock=stock, technicians=roster, seed=seed, **options).serve_forever()
+
+
+def serve_flask(threads, hedge):
+    """
+    The Flask app as deployed, with its circuit breakers and ERP response cache, on a
+    fixed pool of threads.
+    """
+    import logging
+    from concurrent.futures import ThreadPoolExecutor
+    from socketserver import ThreadingMixIn
+    from werkzeug.serving import make_server
+    from api_rest import main as api
+    from api_rest.erp_client import CachedErpClient, ErpClient, ResilientErpClient
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    api.erp_guard = ResilientErpClient(ErpClient(f"http://{HOST}:{ERP_PORT}", pool_size=max(threads, 32)), hedge=hedge)
+    api.erp = CachedErpClient(api.erp_guard)
+    server = make_server(HOST, API_PORT, api.app, threaded=True)
+    pool = ThreadPoolExecutor(threads)
+    server.process_request = lambda request, address: pool.submit(
+        ThreadingMixIn.process_request_thread, server, request, address)
+    server.serve_forever()
+
+
+def serve_async():
+    from aiohttp import web
+    from api_rest.async_main import AsyncErpClient, create_app
+
+    web.run_app(create_app(AsyncErpClient(f"http://{HOST}:{ERP_PORT}")), host=HOST, port=API_PORT,
+                backlog=4096, print=None, access_log=None)
+
+
+def build_requests(count, mix, parts, seed):
+    """
+    Args:
+        count: Number of requests
+        mix: Relative weight of each endpoint, e.g. {"products": 3, "technicians": 1}
+        parts: Part ids are drawn from 1 to parts, plus 5% unknown ids
+        seed: Seed of the request sequence
+
+    Returns:
+        (endpoint, path) pairs
+    """
+    rng = random.Random(seed)
+    endpoints = rng.choices(list(mix), weights=list(mix.values()), k=count)
+    requests = []
+    for endpoint in endpoints:
+        if endpoint == "products":
+            part_id = rng.randint(1, parts) if rng.random() >= 0.05 else parts + rng.randint(1, 1000)
+            requests.append((endpoint, f"/api/products?part_id={part_id}"))
+        else:
+            lat, lon = rng.uniform(-60, 70), rng.uniform(-180, 180)
+            requests.append((endpoint, f"/api/technicians/nearest?lat={lat:.5f}&lon={lon:.5f}"))
+    return requests
+
+
+async def run_load(base_url, requests, rps, max_in_flight):
+    """
+    Returns:
+        (endpoint, status code or None on a connection error or timeout, latency) per
+        request, the seconds from the first request due to the last response, and the
+        largest delay in sending a request after it was due
+    """
+    results = []
+    lag = 0.0
+    loop = asyncio.get_running_loop()
+    connector = aiohttp.TCPConnector(limit=max_in_flight)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60)) as session:
+
+        async def send(endpoint, path, due):
+            status = None
+            try:
+                async with session.get(f"{base_url}{path}") as response:
+                    await response.read()
+                    status = response.status
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+            results.append((endpoint, status, loop.time() - due))
+
+        start = loop.time()
+        tasks = []
+        for i, (endpoint, path) in enumerate(requests):
+            due = start + i / rps
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lag = max(lag, loop.time() - due)
+            tasks.append(asyncio.create_task(send(endpoint, path, due)))
+        await asyncio.gather(*tasks)
+        elapsed = loop.time() - start
+    return results, elapsed, lag
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of sorted values."""
+    return values[min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))]
+
+
+def summarize(results, elapsed):
+    """Throughput, status codes and latency percentiles (in ms) per endpoint and overall."""
+    summary = {}
+    for endpoint in ("all",) + ENDPOINTS:
+        selected = [(status, latency) for name, status, latency in results if endpoint in ("all", name)]
+        if not selected:
+            continue
+        latencies = sorted(latency * 1000 for _, latency in selected)
+        statuses = {}
+        for status, _ in selected:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        summary[endpoint] = {
+            "requests": len(selected),
+            "throughput": len(selected) / elapsed,
+            "statuses": dict(sorted(statuses.items())),
+            "mean_ms": statistics.fmean(latencies),
+            **{f"p{q:g}_ms": percentile(latencies, q) for q in PERCENTILES},
+            "max_ms": latencies[-1],
+        }
+    return summary
+
+
+def parse_mix(values):
+    mix = {}
+    for value in values:
+        endpoint, _, weight = value.partition("=")
+        if endpoint not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint {endpoint!r} in --mix")
+        mix[endpoint] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Base URL of a running API")
+    target.add_argument("--serve", choices=("flask", "async"), help="Start the fake ERP and this API")
+    parser.add_argument("--rps", type=float, default=100.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load")
+    parser.add_argument("--mix", nargs="*", default=["products=3", "technicians=1"], metavar="ENDPOINT=WEIGHT")
+    parser.add_argument("--max-in-flight", type=int, default=1000,
+                        help="Connections to the API; requests beyond it queue, and the wait counts as latency")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="Also write the summary here as JSON")
+    erp = parser.add_argument_group("fake ERP (with --serve)")
+    erp.add_argument("--latency-ms", type=float, default=20.0)
+    erp.add_argument("--technicians-latency-ms", type=float, help="Latency of the roster instead")
+    erp.add_argument("--error-rate", type=float, default=0.0)
+    erp.add_argument("--slow-rate", type=float, default=0.0, help="Share of ERP calls delayed by --slow-latency-ms")
+    erp.add_argument("--slow-latency-ms", type=float, default=1000.0)
+    erp.add_argument("--parts", type=int, default=1000)
+    erp.add_argument("--technicians", type=int, default=1000)
+    erp.add_argument("--flask-threads", type=int, default=16)
+    erp.add_argument("--hedge", action="store_true", help="Hedge ERP calls from the Flask app")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    requests = build_requests(int(args.rps * args.duration), mix, args.parts, args.seed)
+
+    processes = []
+    base_url = args.url.rstrip("/") if args.url else f"http://{HOST}:{API_PORT}"
+    try:
+        if args.serve:
+            latencies = {}
+            if args.technicians_latency_ms is not None:
+                latencies["technicians"] = args.technicians_latency_ms / 1000
+            options = {"latency": args.latency_ms / 1000, "latencies": latencies, "error_rate": args.error_rate,
+                       "slow_rate": args.slow_rate, "slow_latency": args.slow_latency_ms / 1000}
+            erp_args = (options, args.parts, args.technicians, args.seed)
+            api = (serve_flask, (args.flask_threads, args.hedge)) if args.serve == "flask" else (serve_async, ())
+            for target, target_args in ((serve_fake_erp, erp_args), api):
+                processes.append(multiprocessing.Process(target=target, args=target_args, daemon=True))
+                processes[-1].start()
+            wait_for(f"http://{HOST}:{ERP_PORT}/stock/A05")
+            wait_for(f"{base_url}/api/products")
+
+        results, elapsed, lag = asyncio.run(run_load(base_url, requests, args.rps, args.max_in_flight))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+
+    summary = summarize(results, elapsed)
+    print(f"target {args.rps:g} req/s for {args.duration:g} s, sent {len(results)} "
+          f"(largest send delay {lag * 1000:.1f} ms)")
+    print(f"{'endpoint':>12} {'req/s':>8} " + " ".join(f"{f'p{q:g} ms':>9}" for q in PERCENTILES)
+          + f" {'max ms':>9}  statuses")
+    for endpoint, stats in summary.items():
+        print(f"{endpoint:>12} {stats['throughput']:8.1f} "
+              + " ".join(f"{stats[f'p{q:g}_ms']:9.1f}" for q in PERCENTILES)
+              + f" {stats['max_ms']:9.1f}  {stats['statuses']}")
+    if args.output:
+        args.output.write_text(json.dumps({"args": {key: str(value) for key, value in vars(args).items()},
+                                           "send_delay_ms": lag * 1000, "summary": summary}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
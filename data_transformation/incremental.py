@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, Optional, Set, Tuple
+
+from data_transformation.main import ConfigLoader, parse_json_to_csv
+from data_transformation.metrics import PipelineMetrics
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+# Manifest
+class Manifest:
+    """
+    State of an incremental run: content hashes of the entries already processed, the
+    next details_id and the size each output had once the run completed.
+    """
+    def __init__(self, hashes: Optional[Set[str]] = None, next_details_id: int = 1,
+                 transaction_bytes: int = 0, details_bytes: int = 0):
+        self.hashes = hashes if hashes is not None else set()
+        self.next_details_id = next_details_id
+        self.transaction_bytes = transaction_bytes
+        self.details_bytes = details_bytes
+
+    @classmethod
+    def load(cls, manifest_file: Path) -> Optional["Manifest"]:
+        try:
+            with manifest_file.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable manifest {manifest_file}: {e}. Rebuilding outputs.")
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            logger.warning(f"Manifest {manifest_file} has an unsupported version. Rebuilding outputs.")
+            return None
+        return cls(set(data["hashes"]), data["next_details_id"], data["transaction_bytes"], data["details_bytes"])
+
+    def save(self, manifest_file: Path):
+        """Writes the manifest atomically, so a crash leaves the previous one intact."""
+        tmp_file = manifest_file.with_name(manifest_file.name + ".tmp")
+        with tmp_file.open("w", encoding="utf-8") as f:
+            json.dump({
+                "version": MANIFEST_VERSION,
+                "next_details_id": self.next_details_id,
+                "transaction_bytes": self.transaction_bytes,
+                "details_bytes": self.details_bytes,
+                "hashes": sorted(self.hashes),
+            }, f)
+        os.replace(tmp_file, manifest_file)
+
+def entry_hash(entry: Dict[str, Any]) -> str:
+    canonical = json.dumps(entry, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+def _restore_outputs(manifest: Manifest, transaction_file: Path, details_file: Path) -> bool:
+    """
+    Truncates rows a crashed run appended after the manifest was last saved.
+
+    Returns:
+        False when the outputs no longer match the manifest and must be rebuilt
+    """
+    for file, size in ((transaction_file, manifest.transaction_bytes), (details_file, manifest.details_bytes)):
+        if not file.exists() or file.stat().st_size < size:
+            return False
+        if file.stat().st_size > size:
+            logger.warning(f"Discarding {file.stat().st_size - size} bytes appended to {file} by an unfinished run")
+            os.truncate(file, size)
+    return True
+
+# Incremental Pipeline
+def parse_json_to_csv_incremental(json_data: Iterable[Dict[str, Any]], transaction_file: Path, details_file: Path,
+                                  manifest_file: Path, config: ConfigLoader,
+                                  full_rebuild: bool = False,
+                                  metrics: Optional[PipelineMetrics] = None) -> Tuple[int, int]:
+    """
+    Appends only the entries not seen by previous runs to the CSV files.
+
+    An entry is identified by a hash of its content, so a changed entry is appended again
+    as a new row; downstream consumers should keep the last row per transaction_id, or
+    run a full rebuild to compact the outputs. The outputs are rebuilt from scratch when
+    full_rebuild is set or the manifest is missing or inconsistent with them; the manifest
+    is deleted first and only saved again once the rebuild completes.
+
+    Returns:
+        The number of transactions and item details appended
+    """
+    manifest = None if full_rebuild else Manifest.load(manifest_file)
+    if manifest is not None and not _restore_outputs(manifest, transaction_file, details_file):
+        logger.warning(f"Outputs are out of sync with {manifest_file}. Rebuilding outputs.")
+        manifest = None
+    append = manifest is not None
+    if not append:
+        # The outputs are about to be overwritten: a rebuild cut short must not leave a
+        # manifest behind that describes the old ones
+        manifest_file.unlink(missing_ok=True)
+    manifest = manifest or Manifest()
+
+    seen = manifest.hashes
+    skipped = 0
+
+    def new_entries() -> Iterator[Dict[str, Any]]:
+        nonlocal skipped
+        fresh = set()
+        for entry in json_data:
+            digest = entry_hash(entry)
+            if digest in seen:
+                skipped += 1
+                continue
+            fresh.add(digest)
+            yield entry
+        seen.update(fresh)
+
+    counts = parse_json_to_csv(new_entries(), transaction_file, details_file, config,
+                               details_id=manifest.next_details_id, append=append, metrics=metrics)
+
+    manifest.next_details_id += counts[1]
+    manifest.transaction_bytes = transaction_file.stat().st_size
+    manifest.details_bytes = details_file.stat().st_size
+    manifest.save(manifest_file)
+
+    logger.info(f"{'Appended' if append else 'Rebuilt outputs with'} {counts[0]} transactions; "
+                f"skipped {skipped} unchanged entries")
+    return counts
@@ -1,47 +1,328 @@
+import argparse
 import json
 import yaml
 import logging
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Union, Iterable, Iterator, Optional, Tuple, Callable, FrozenSet
+from collections import Counter
+from functools import lru_cache
+from operator import itemgetter
 from pydantic import BaseModel, ValidationError
 from datetime import date, datetime
 from pathlib import Path
-import csv
 import re
+import sys
+
+if __package__ in (None, ""):
+    # Run as a script: make the data_transformation package importable
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data_transformation.metrics import PipelineMetrics
+from data_transformation.sinks import SINKS, open_sink, output_format
+from data_transformation.streaming import JsonArrayDecoder
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Field Resolution
+class FieldResolutionPlan:
+    """
+    Resolves target fields from records whose keys vary between sources.
+
+    Each field has an ordered list of aliases, which may be dotted paths into nested
+    objects (e.g. "buyer.full_name"); the first alias holding a non-null value wins,
+    otherwise the field default is used. Which aliases can apply only depends on the
+    record's top-level keys, so a getter is compiled once per key shape and cached.
+    Records of one source mostly share a shape: a record with the same keys as the
+    last one reuses its getter, compared against a snapshot of those keys rather than
+    a shape key built for every record.
+    """
+    MAX_SHAPES = 1024
+
+    def __init__(self, fields: Dict[str, Tuple[List[str], Any]]):
+        self.fields = list(fields)
+        self.defaults = tuple(default for _, default in fields.values())
+        self._paths = [[tuple(alias.split('.')) for alias in aliases] for aliases, _ in fields.values()]
+        self._getters: Dict[Tuple[str, ...], Callable[[Dict[str, Any]], Tuple[Any, ...]]] = {}
+        # No record's keys compare equal to None, so the first record always compiles a getter
+        self._last_keys: Optional[FrozenSet[str]] = None
+        self._last_getter: Optional[Callable[[Dict[str, Any]], Tuple[Any, ...]]] = None
+
+    def resolve(self, entry: Dict[str, Any]) -> Tuple[Any, ...]:
+        """Returns the value of every field, in plan order."""
+        if entry.keys() == self._last_keys:
+            values = self._last_getter(entry)
+        else:
+            shape = tuple(entry)
+            getter = self._getters.get(shape)
+            if getter is None:
+                if len(self._getters) >= self.MAX_SHAPES:
+                    self._getters.clear()
+                getter = self._getters[shape] = self._compile_getter(shape)
+            self._last_keys, self._last_getter = frozenset(shape), getter
+            values = getter(entry)
+        if None in values:
+            values = tuple(default if value is None else value for value, default in zip(values, self.defaults))
+        return values
+
+    def _compile_getter(self, shape: Tuple[str, ...]) -> Callable[[Dict[str, Any]], Tuple[Any, ...]]:
+        present = set(shape)
+        candidates = [[path for path in paths if path[0] in present] for paths in self._paths]
+
+        # Fields with a single top-level key come out of one itemgetter call, absent fields
+        # are their default, and only the rest (several candidates, nested paths) is looked
+        # up field by field; the values are then put back in plan order
+        keyed = [i for i, paths in enumerate(candidates) if len(paths) == 1 and len(paths[0]) == 1]
+        absent = [i for i, paths in enumerate(candidates) if not paths]
+        searched = [i for i in range(len(candidates)) if i not in keyed and i not in absent]
+        if len(keyed) == len(candidates) > 1:
+            return itemgetter(*(candidates[i][0][0] for i in keyed))
+
+        get_keyed = itemgetter(*(candidates[i][0][0] for i in keyed)) if keyed else lambda entry: ()
+        if len(keyed) == 1:
+            get_single = get_keyed
+            get_keyed = lambda entry: (get_single(entry),)
+        absent_defaults = tuple(self.defaults[i] for i in absent)
+        searched_paths = [candidates[i] for i in searched]
+        order = keyed + absent + searched
+        arrange = itemgetter(*(order.index(i) for i in range(len(candidates))))
+        if len(candidates) == 1:
+            arrange = lambda values: values
+        if not searched:
+            return lambda entry: arrange(get_keyed(entry) + absent_defaults)
+        return lambda entry: arrange(get_keyed(entry) + absent_defaults
+                                     + tuple([_lookup_first(entry, paths) for paths in searched_paths]))
+
+def _lookup_first(entry: Dict[str, Any], paths: List[Tuple[str, ...]]) -> Any:
+    for path in paths:
+        value = entry
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+            if value is None:
+                break
+        else:
+            return value
+    return None
+
 # Load Configuration
 class ConfigLoader:
     def __init__(self, yaml_file: Path):
         with yaml_file.open("r") as file:
             self.config = yaml.safe_load(file)
+        self._compile()
 
     def get(self, key: str, default: Any = None) -> Any:
         return self.config.get(key, default)
 
+    # Compiled lookups hold caches that don't pickle; rebuild them instead (e.g. in worker processes)
+    def __getstate__(self) -> Dict[str, Any]:
+        return {'config': self.config}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.config = state['config']
+        self._compile()
+
+    def _compile(self):
+        """Precomputes the lookups the pipeline needs for every record."""
+        self.field_plan = FieldResolutionPlan({
+            'transaction_id': (self.get('id_fields', []), 0),
+            'customer_name': (self.get('name_fields', []), ''),
+            'purchase_date': (self.get('date_fields', []), ''),
+            'total_amount': (self.get('amount_fields', []), 0),
+            'status': (self.get('status_fields', []), 'Unknown'),
+        })
+        self.output_format = (self.get('files') or {}).get('output_format')
+        self.date_parser = DateParser(self.get('date_formats', []))
+        self.amount_parser = AmountParser(str(self.get('decimal_separator', 'auto')),
+                                          str(self.get('thousands_separator', 'auto')))
+        self.status_normalizer = StatusNormalizer(self.get('status_mapping', {}),
+                                                  self.get('status_unknown_policy', 'keep'),
+                                                  self.get('status_default', 'Unknown'))
+
 # Utility Functions
 def clean_string(value: str) -> str:
     return value.strip() if isinstance(value, str) else str(value).strip()
 
 def parse_date(date_str: str, date_formats: List[str]) -> date:
-    date_str = clean_string(date_str)
-    for fmt in date_formats:
+    key = tuple(date_formats)
+    parser = _date_parsers.get(key)
+    if parser is None:
+        parser = _date_parsers[key] = DateParser(date_formats)
+    return parser(date_str)
+
+def parse_amount(amount_str: Any) -> float:
+    return _amount_parser(amount_str)
+
+# Amount Parsing
+_PLAIN_AMOUNT = re.compile(r'-?[0-9]+(?:\.[0-9]+)?')
+_PLAIN_INTEGER = re.compile(r'-?[0-9]+')
+_NEGATIVE_AMOUNT = re.compile(r'[^0-9]*-')
+_SEPARATORS = (".", ",")
+
+class AmountParser:
+    """
+    Parses amounts such as 780.25, "1,200.50€", "€1.500,75" or "1 250.50 EUR", falling back to 0.
+
+    Ints and floats are returned without touching str() or a regex, and strings are
+    memoized in a bounded LRU cache. Currency symbols, spaces and other characters are
+    ignored; a leading minus sign is kept.
+
+    With "auto" separators, the last of "." and "," is the decimal separator when both
+    occur and a repeated separator groups thousands. A lone "," followed by exactly three
+    digits groups thousands too ("1,200"); otherwise a lone separator is decimal ("12,5").
+    Setting either separator in config.yml fixes both, for exports in a known locale.
+    """
+    def __init__(self, decimal_separator: str = "auto", thousands_separator: str = "auto",
+                 cache_size: int = 16384):
+        if decimal_separator == "auto" and thousands_separator in _SEPARATORS:
+            decimal_separator = "," if thousands_separator == "." else "."
+        if decimal_separator not in ("auto", *_SEPARATORS):
+            raise ValueError(f"Unknown decimal separator '{decimal_separator}', expected auto, '.' or ','")
+        if decimal_separator != "auto" and decimal_separator == thousands_separator:
+            raise ValueError(f"The decimal and thousands separators are both '{decimal_separator}'")
+        self.decimal_separator = decimal_separator
+        self.thousands_separator = thousands_separator
+        self.fallbacks = 0
+        # Everything but digits and the separators that still matter is ignored
+        kept = "., " if decimal_separator == "auto" else decimal_separator
+        self._ignored = re.compile(f"[^0-9{re.escape(kept)}]")
+        # Strings float() reads the same way skip the separator rules
+        self._plain = _PLAIN_INTEGER if decimal_separator == "," else _PLAIN_AMOUNT
+        self._parse_cached = lru_cache(maxsize=cache_size)(self._parse)
+
+    def __call__(self, value: Any) -> float:
+        value_type = type(value)
+        if value_type is float:
+            return value
+        if value_type is int:
+            return float(value)
+
+        parsed = self._parse_cached(value if value_type is str else clean_string(value))
+        if parsed is None:
+            self.fallbacks += 1
+            logger.warning(f"Invalid amount: {clean_string(value)}. Using 0.")
+            return 0.0
+        return parsed
+
+    def _parse(self, amount_str: str) -> Optional[float]:
+        amount_str = amount_str.strip()
+        if self._plain.fullmatch(amount_str):
+            return float(amount_str)
+
+        digits = self._ignored.sub('', amount_str).replace(' ', '')
+        decimal = self._decimal_separator(digits)
+        if decimal:
+            integer, _, fraction = digits.rpartition(decimal)
+        else:
+            integer, fraction = digits, ''
+        integer = integer.replace('.', '').replace(',', '')
+        if not integer.isdigit() and not fraction.isdigit():
+            return None
         try:
-            return datetime.strptime(date_str, fmt).date()
+            amount = float(f"{integer or 0}.{fraction or 0}")
         except ValueError:
-            continue
-    logger.warning(f"Invalid date: {date_str}. Using today's date.")
-    return date.today()
-
-def parse_amount(amount_str: str) -> float:
-    amount_str = re.sub(r'[^0-9.]', '', str(amount_str))
-    try:
-        return float(amount_str)
-    except ValueError:
-        logger.warning(f"Invalid amount: {amount_str}. Using 0.")
-        return 0.0
+            return None
+        return -amount if _NEGATIVE_AMOUNT.match(amount_str) else amount
+
+    def _decimal_separator(self, digits: str) -> Optional[str]:
+        if self.decimal_separator != "auto":
+            return self.decimal_separator if self.decimal_separator in digits else None
+
+        last = max(digits.rfind("."), digits.rfind(","))
+        if last < 0:
+            return None
+        separator = digits[last]
+        other = "," if separator == "." else "."
+        if other in digits:
+            return separator
+        if digits.count(separator) > 1:
+            return None
+        if separator == "," and len(digits) - last - 1 == 3:
+            return None
+        return separator
+
+_amount_parser = AmountParser()
+
+# Date Parsing
+_ISO_DATE = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}')
+
+class DateParser:
+    """
+    Parses dates against a list of formats, falling back to today's date.
+
+    Results are memoized per input string in a bounded LRU cache, and the format that
+    last matched moves to the front of the list. Reordering assumes a string matches at
+    most one format, which holds for the shipped config. When "%Y-%m-%d" is one of the
+    formats, ISO dates skip strptime entirely.
+    """
+    def __init__(self, date_formats: List[str], cache_size: int = 4096):
+        self.formats = list(date_formats)
+        self.iso_fast_path = "%Y-%m-%d" in self.formats
+        self.fallbacks = 0
+        self._parse_cached = lru_cache(maxsize=cache_size)(self._parse)
+
+    def __call__(self, value: Any) -> date:
+        parsed = self._parse_cached(value if type(value) is str else clean_string(value))
+        if parsed is None:
+            self.fallbacks += 1
+            logger.warning(f"Invalid date: {clean_string(value)}. Using today's date.")
+            return date.today()
+        return parsed
+
+    def _parse(self, date_str: str) -> Optional[date]:
+        date_str = date_str.strip()
+        if self.iso_fast_path and _ISO_DATE.fullmatch(date_str):
+            try:
+                return date.fromisoformat(date_str)
+            except ValueError:
+                pass
+
+        formats = self.formats
+        for i, fmt in enumerate(formats):
+            try:
+                parsed = datetime.strptime(date_str, fmt).date()
+            except ValueError:
+                continue
+            if i:
+                formats.insert(0, formats.pop(i))
+            return parsed
+        return None
+
+_date_parsers: Dict[Tuple[str, ...], DateParser] = {}
+
+# Status Normalization
+class StatusNormalizer:
+    """
+    Maps raw status values onto the canonical names of status_mapping.
+
+    The canonical names and their synonyms are stripped and case-folded into a single
+    lookup table at load time. Values missing from it are counted in `unmapped` and
+    handled by the unknown policy: "keep" the raw value, replace it with the "default"
+    status, or "reject" it, which fails Transaction validation and drops the record.
+    """
+    POLICIES = ("keep", "default", "reject")
+
+    def __init__(self, status_mapping: Dict[str, List[str]], unknown_policy: str = "keep",
+                 default: str = "Unknown"):
+        if unknown_policy not in self.POLICIES:
+            raise ValueError(f"Unknown status policy '{unknown_policy}', expected one of {self.POLICIES}")
+        self.unknown_policy = unknown_policy
+        self.default = default
+        self.unmapped: Counter = Counter()
+        self.lookup: Dict[str, str] = {}
+        for canonical, synonyms in (status_mapping or {}).items():
+            for synonym in [canonical, *(synonyms or [])]:
+                self.lookup[clean_string(synonym).casefold()] = canonical
+
+    def __call__(self, status: Any) -> Optional[str]:
+        key = clean_string(status)
+        canonical = self.lookup.get(key.casefold())
+        if canonical is not None:
+            return canonical
+
+        self.unmapped[key] += 1
+        if self.unknown_policy == "keep":
+            return status
+        return self.default if self.unknown_policy == "default" else None
 
 # Pydantic Models
 class Transaction(BaseModel):
@@ -58,60 +339,188 @@ class ItemDetail(BaseModel):
     quantity: int
     price: float
 
+# Streaming Input
+def iter_json_records(json_file: Path, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """Yields the items of a top-level JSON array one at a time, reading the file in chunks."""
+    decoder = JsonArrayDecoder()
+    with json_file.open("rb") as file:
+        while chunk := file.read(chunk_size):
+            yield from decoder.feed(chunk)
+    yield from decoder.close()
+
 # Processing JSON to CSV
-def parse_json_to_csv(json_data: List[Dict[str, Any]], transaction_file: Path, details_file: Path,
-                     config: ConfigLoader):
-    transactions = []
-    item_details = []
-    details_id_counter = 1
+def transform_records(json_data: Iterable[Dict[str, Any]], config: ConfigLoader, details_id: int = 1,
+                      metrics: Optional[PipelineMetrics] = None) -> Iterator[Tuple[Transaction, List[ItemDetail]]]:
+    """Validates each entry lazily, yielding its transaction and item details."""
+    resolve = config.field_plan.resolve
+    parse_purchase_date = config.date_parser
+    normalize_status = config.status_normalizer
+    to_amount = config.amount_parser
+    new_transaction, new_item_detail = Transaction, ItemDetail
+
+    if metrics is not None:
+        json_data = metrics.timed_iter('json_parse', json_data)
+        resolve = metrics.timed('field_resolution', resolve)
+        parse_purchase_date = metrics.timed('date_parse', parse_purchase_date)
+        normalize_status = metrics.timed('status_normalization', normalize_status)
+        to_amount = metrics.timed('amount_parse', to_amount)
+        new_transaction = metrics.timed('validation', Transaction)
+        new_item_detail = metrics.timed('validation', ItemDetail)
 
     for entry in json_data:
+        transaction: Optional[Transaction] = None
+        item_details: List[ItemDetail] = []
         try:
-            transaction = Transaction(
-                transaction_id=int(entry.get(config.get('id_fields')[0], 0)),
-                customer_name=clean_string(entry.get(config.get('name_fields')[0], '')),
-                purchase_date=parse_date(entry.get(config.get('date_fields')[0], ''), config.get('date_formats', [])),
-                total_amount=parse_amount(entry.get(config.get('amount_fields')[0], 0)),
-                status=entry.get(config.get('status_fields')[0], 'Unknown')
+            transaction_id, customer_name, purchase_date, total_amount, status = resolve(entry)
+            transaction = new_transaction(
+                transaction_id=int(transaction_id),
+                customer_name=clean_string(customer_name),
+                purchase_date=parse_purchase_date(purchase_date),
+                total_amount=to_amount(total_amount),
+                status=normalize_status(status)
             )
-            transactions.append(transaction)
 
             for item in entry.get('items', []):
-                item_details.append(ItemDetail(
-                    details_id=details_id_counter,
-                    transaction_id=int(entry.get(config.get('id_fields')[0], 0)),
+                item_details.append(new_item_detail(
+                    details_id=details_id,
+                    transaction_id=transaction.transaction_id,
                     item=clean_string(item.get('item', 'Unknown')),
                     quantity=int(item.get('quantity', 1)),
-                    price=parse_amount(item.get('price', 0))
+                    price=to_amount(item.get('price', 0))
                 ))
-                details_id_counter += 1
+                details_id += 1
         except ValidationError as e:
+            if metrics is not None:
+                metrics.stage('validation').errors += 1
             logger.error(f"Error validating transaction: {entry}. Error: {e}")
 
-    # Save CSV
-    with transaction_file.open('w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(Transaction.model_fields.keys())
-        for trans in transactions:
-            writer.writerow(trans.model_dump().values())
+        if transaction is not None:
+            yield transaction, item_details
+
+def parse_json_to_csv(json_data: Iterable[Dict[str, Any]], transaction_file: Path, details_file: Path,
+                     config: ConfigLoader, details_id: int = 1, append: bool = False,
+                     metrics: Optional[PipelineMetrics] = None) -> Tuple[int, int]:
+    """
+    Transforms the entries and writes both outputs as it goes, so memory stays bounded
+    when json_data is a stream (see iter_json_records). Outputs are CSV unless
+    files.output_format or the file suffix selects another sink (see sinks.py).
+
+    With append, rows are added to the existing files (headers are only written to new or
+    empty ones) and details_id should continue from the last id already written.
+    Pass a PipelineMetrics to record per-stage timings and counts.
 
-    with details_file.open('w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(ItemDetail.model_fields.keys())
-        for detail in item_details:
-            writer.writerow(detail.model_dump().values())
+    Returns:
+        The number of transactions and item details written
+    """
+    transaction_count = 0
+    details_count = 0
+    if metrics is not None:
+        fallbacks = fallback_totals(config)
+        metrics.start()
 
-    logger.info(f"Processed {len(transactions)} transactions and {len(item_details)} item details")
+    with open_sink(transaction_file, Transaction, config.output_format, append) as transaction_sink, \
+            open_sink(details_file, ItemDetail, config.output_format, append) as details_sink:
+        if metrics is not None:
+            transaction_sink.instrument(metrics)
+            details_sink.instrument(metrics)
+
+        for transaction, item_details in transform_records(json_data, config, details_id, metrics):
+            transaction_sink.write(transaction.model_dump().values())
+            transaction_count += 1
+            details_sink.write_many(detail.model_dump().values() for detail in item_details)
+            details_count += len(item_details)
+
+    if metrics is not None:
+        metrics.stop()
+        record_run(metrics, config, fallbacks, transaction_count, details_count)
+
+    logger.info(f"Processed {transaction_count} transactions and {details_count} item details")
+    log_unmapped_statuses(config)
+    return transaction_count, details_count
+
+def fallback_totals(config: ConfigLoader) -> Dict[str, int]:
+    """Running totals of default values substituted, by pipeline stage."""
+    return {
+        'date_parse': config.date_parser.fallbacks,
+        'amount_parse': config.amount_parser.fallbacks,
+        'status_normalization': sum(config.status_normalizer.unmapped.values()),
+    }
+
+def record_run(metrics: PipelineMetrics, config: ConfigLoader, fallbacks_before: Dict[str, int],
+               transactions: int, details: int):
+    """Adds a finished run's record counts and fallbacks to metrics."""
+    for stage, total in fallback_totals(config).items():
+        metrics.stage(stage).fallbacks += total - fallbacks_before[stage]
+    metrics.records = metrics.stage('json_parse').calls
+    metrics.transactions += transactions
+    metrics.details += details
+
+def log_unmapped_statuses(config: ConfigLoader):
+    unmapped = config.status_normalizer.unmapped
+    if unmapped:
+        logger.warning(f"Unmapped statuses (add them to status_mapping): {dict(unmapped.most_common())}")
 
 # Execute Pipeline
-if __name__ == "__main__":
-    config = ConfigLoader(Path("data_transformation/config.yml"))
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Transform ERP JSON exports into CSV files.")
+    parser.add_argument("--config", type=Path, default=Path("data_transformation/config.yml"),
+                        help="Path to the pipeline configuration")
+    parser.add_argument("--stream", action="store_true",
+                        help="Read the input one record at a time instead of loading it whole")
+    parser.add_argument("--backend", choices=["rows", "columnar", "parallel"], default="rows",
+                        help="Transform record by record, in column batches, or in shards across processes")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes for the parallel backend (default: CPU count)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only transform new or changed records and append them to the outputs")
+    parser.add_argument("--full-rebuild", action="store_true",
+                        help="With --incremental, discard the manifest and rewrite the outputs")
+    parser.add_argument("--metrics", type=Path, default=None,
+                        help="Write per-stage metrics to this file (Prometheus text for .prom, JSON otherwise)")
+    args = parser.parse_args(argv)
+    if args.incremental and args.backend != "rows":
+        parser.error("--incremental only supports the rows backend")
+    if args.metrics and args.backend == "parallel":
+        parser.error("--metrics is not supported by the parallel backend")
+
+    config = ConfigLoader(args.config)
 
     input_file = Path(config.get("files")["input"])
     transaction_output = Path(config.get("files")["transaction_output"])
     details_output = Path(config.get("files")["details_output"])
+    if args.incremental:
+        for output in (transaction_output, details_output):
+            fmt = output_format(output, config.output_format)
+            if fmt in SINKS and not SINKS[fmt].supports_append:
+                parser.error(f"--incremental appends to the outputs, and {output} is in the {fmt} format, "
+                             f"which cannot be appended to")
+
+    if args.stream:
+        json_data = iter_json_records(input_file)
+    else:
+        with input_file.open("r", encoding="utf-8") as file:
+            json_data = json.load(file)
+
+    metrics = PipelineMetrics() if args.metrics else None
 
-    with input_file.open("r", encoding="utf-8") as file:
-        json_data = json.load(file)
+    if args.incremental:
+        from data_transformation.incremental import parse_json_to_csv_incremental
+        manifest = Path(config.get("files").get("manifest", f"{transaction_output}.manifest.json"))
+        parse_json_to_csv_incremental(json_data, transaction_output, details_output, manifest, config,
+                                      full_rebuild=args.full_rebuild, metrics=metrics)
+    elif args.backend == "columnar":
+        from data_transformation.columnar import parse_json_to_csv_columnar
+        parse_json_to_csv_columnar(json_data, transaction_output, details_output, config, metrics=metrics)
+    elif args.backend == "parallel":
+        from data_transformation.parallel import parse_json_to_csv_parallel
+        parse_json_to_csv_parallel(json_data, transaction_output, details_output, config, workers=args.workers)
+    else:
+        parse_json_to_csv(json_data, transaction_output, details_output, config, metrics=metrics)
 
-    parse_json_to_csv(json_data, transaction_output, details_output, config)
\ No newline at end of file
+    if metrics is not None:
+        metrics.export(args.metrics)
+        logger.info(f"Wrote pipeline metrics to {args.metrics}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import logging
+import os
+from collections import Counter, deque
+from multiprocessing import Pool
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from data_transformation.main import ConfigLoader, Transaction, ItemDetail, log_unmapped_statuses
+from data_transformation.columnar import iter_batches, transform_batch
+from data_transformation.sinks import open_sink
+
+logger = logging.getLogger(__name__)
+
+# Worker Side
+_worker_config: Optional[ConfigLoader] = None
+
+def _init_worker(config: ConfigLoader):
+    global _worker_config
+    _worker_config = config
+    # Forked workers inherit the parent's counts, which it already holds
+    _worker_config.status_normalizer.unmapped.clear()
+
+def _transform_shard(shard: List[Dict[str, Any]]) -> Tuple[List[Tuple[Any, ...]], List[Tuple[Any, ...]], Counter]:
+    """
+    Returns:
+        The shard's transaction rows, its item detail rows without the details_id column,
+        and the unmapped statuses it met
+    """
+    transaction_rows, item_rows = transform_batch(shard, _worker_config)
+
+    unmapped = _worker_config.status_normalizer.unmapped
+    shard_unmapped = Counter(unmapped)
+    unmapped.clear()
+    return transaction_rows, [row[1:] for row in item_rows], shard_unmapped
+
+# Sharded Pipeline
+def parse_json_to_csv_parallel(json_data: Iterable[Dict[str, Any]], transaction_file: Path, details_file: Path,
+                               config: ConfigLoader, workers: Optional[int] = None,
+                               shard_size: int = 10_000) -> Tuple[int, int]:
+    """
+    Shards the entries across a process pool and writes the same outputs as parse_json_to_csv.
+
+    Shards are transformed independently and merged in input order. details_id is only
+    assigned while merging, offset by the number of items in the preceding shards, so
+    the output matches a serial run. At most two shards per worker are in flight, which
+    keeps memory bounded when json_data is a stream.
+
+    Returns:
+        The number of transactions and item details written
+    """
+    workers = workers or os.cpu_count() or 1
+    transaction_count = 0
+    details_count = 0
+
+    with open_sink(transaction_file, Transaction, config.output_format) as transaction_sink, \
+            open_sink(details_file, ItemDetail, config.output_format) as details_sink, \
+            Pool(workers, initializer=_init_worker, initargs=(config,)) as pool:
+
+        def merge(result):
+            nonlocal transaction_count, details_count
+            transaction_rows, item_rows, unmapped = result.get()
+            config.status_normalizer.unmapped.update(unmapped)
+            transaction_sink.write_many(transaction_rows)
+            details_sink.write_many((details_count + i, *row) for i, row in enumerate(item_rows, start=1))
+            transaction_count += len(transaction_rows)
+            details_count += len(item_rows)
+
+        pending = deque()
+        for shard in iter_batches(json_data, shard_size):
+            pending.append(pool.apply_async(_transform_shard, (shard,)))
+            if len(pending) >= 2 * workers:
+                merge(pending.popleft())
+        while pending:
+            merge(pending.popleft())
+
+    logger.info(f"Processed {transaction_count} transactions and {details_count} item details "
+                f"with {workers} workers")
+    log_unmapped_statuses(config)
+    return transaction_count, details_count
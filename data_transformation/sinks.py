@@ -0,0 +1,189 @@
+import csv
+import gzip
+from abc import ABC, abstractmethod
+from datetime import date
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional, Type
+
+from pydantic import BaseModel
+
+DEFAULT_BATCH_SIZE = 65_536
+
+# Output format by file suffix, used when config.yml doesn't set files.output_format
+SUFFIX_FORMATS = {
+    ".csv.gz": "csv.gz",
+    ".csv.zst": "csv.zst",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".csv": "csv",
+}
+
+def output_format(path: Path, configured: Optional[str] = None) -> str:
+    if configured:
+        return configured
+    name = path.name.lower()
+    return next((fmt for suffix, fmt in SUFFIX_FORMATS.items() if name.endswith(suffix)), "csv")
+
+# Sinks
+class Sink(ABC):
+    """
+    Buffered writer for the rows of a pydantic model, in model field order.
+
+    Rows are collected and written in batches of batch_size. Subclasses implement
+    _write_batch and _close.
+    """
+    supports_append = False
+
+    def __init__(self, path: Path, model: Type[BaseModel], append: bool = False,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        if append and not self.supports_append:
+            raise ValueError(f"{type(self).__name__} cannot append to {path}")
+        self.path = path
+        self.model = model
+        self.columns = list(model.model_fields)
+        self.batch_size = batch_size
+        self._buffer: List[Iterable[Any]] = []
+
+    def write(self, row: Iterable[Any]):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, rows: Iterable[Iterable[Any]]):
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def instrument(self, metrics):
+        """Times batch writes, including the final flush, under the metrics' "write" stage."""
+        self._write_batch = metrics.timed("write", self._write_batch)
+
+    def flush(self):
+        if self._buffer:
+            self._write_batch(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        self.flush()
+        self._close()
+
+    def __enter__(self) -> "Sink":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @abstractmethod
+    def _write_batch(self, rows: List[Iterable[Any]]):
+        """Writes a batch of rows to the output."""
+
+    @abstractmethod
+    def _close(self):
+        """Closes the output once the last batch is written."""
+
+class CsvSink(Sink):
+    supports_append = True
+
+    def __init__(self, path: Path, model: Type[BaseModel], append: bool = False,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        super().__init__(path, model, append, batch_size)
+        is_empty = not append or not path.exists() or path.stat().st_size == 0
+        self._file = self._open('a' if append else 'w')
+        self._writer = csv.writer(self._file)
+        if is_empty:
+            self._writer.writerow(self.columns)
+
+    def _open(self, mode: str):
+        return self.path.open(mode, newline='', encoding='utf-8')
+
+    def _write_batch(self, rows: List[Iterable[Any]]):
+        self._writer.writerows(rows)
+
+    def _close(self):
+        self._file.close()
+
+class GzipCsvSink(CsvSink):
+    """Appending adds a gzip member, which readers decompress as one stream."""
+    def _open(self, mode: str):
+        return gzip.open(self.path, mode + 't', compresslevel=6, newline='', encoding='utf-8')
+
+class ZstdCsvSink(CsvSink):
+    """Appending adds a zstd frame, which readers decompress as one stream."""
+    def _open(self, mode: str):
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("The csv.zst output format requires the 'zstandard' package") from e
+        return zstandard.open(self.path, mode + 't', newline='', encoding='utf-8')
+
+class _ArrowSink(Sink):
+    """Converts batches to Arrow record batches typed after the model's fields."""
+    def __init__(self, path: Path, model: Type[BaseModel], append: bool = False,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        super().__init__(path, model, append, batch_size)
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise ImportError(f"The {output_format(path)} output format requires the 'pyarrow' package") from e
+        self._pa = pyarrow
+        self.schema = pyarrow.schema([
+            (name, self._arrow_type(field.annotation)) for name, field in model.model_fields.items()
+        ])
+
+    def _arrow_type(self, annotation: Any):
+        pa = self._pa
+        types = {int: pa.int64(), float: pa.float64(), str: pa.string(), date: pa.date32(), bool: pa.bool_()}
+        # Unions such as `int | str` are stored as strings
+        return types.get(annotation, pa.string())
+
+    def _record_batch(self, rows: List[Iterable[Any]]):
+        columns = list(zip(*rows))
+        arrays = []
+        for values, field in zip(columns, self.schema):
+            if field.type == self._pa.string():
+                values = [None if value is None else str(value) for value in values]
+            arrays.append(self._pa.array(values, type=field.type))
+        return self._pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+class ArrowIpcSink(_ArrowSink):
+    def __init__(self, path: Path, model: Type[BaseModel], append: bool = False,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        super().__init__(path, model, append, batch_size)
+        self._writer = self._pa.ipc.new_file(str(path), self.schema)
+
+    def _write_batch(self, rows: List[Iterable[Any]]):
+        self._writer.write_batch(self._record_batch(rows))
+
+    def _close(self):
+        self._writer.close()
+
+class ParquetSink(_ArrowSink):
+    """Each batch becomes a row group."""
+    def __init__(self, path: Path, model: Type[BaseModel], append: bool = False,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        super().__init__(path, model, append, batch_size)
+        import pyarrow.parquet
+        self._writer = pyarrow.parquet.ParquetWriter(str(path), self.schema, compression='zstd')
+
+    def _write_batch(self, rows: List[Iterable[Any]]):
+        self._writer.write_batch(self._record_batch(rows))
+
+    def _close(self):
+        self._writer.close()
+
+SINKS: Dict[str, Type[Sink]] = {
+    "csv": CsvSink,
+    "csv.gz": GzipCsvSink,
+    "csv.zst": ZstdCsvSink,
+    "arrow": ArrowIpcSink,
+    "parquet": ParquetSink,
+}
+
+def open_sink(path: Path, model: Type[BaseModel], configured_format: Optional[str] = None,
+              append: bool = False, batch_size: int = DEFAULT_BATCH_SIZE) -> Sink:
+    """Opens the sink for path's output format (see output_format)."""
+    fmt = output_format(path, configured_format)
+    if fmt not in SINKS:
+        raise ValueError(f"Unknown output format '{fmt}', expected one of {list(SINKS)}")
+    return SINKS[fmt](path, model, append, batch_size)
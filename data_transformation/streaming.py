@@ -0,0 +1,84 @@
+import codecs
+import json
+import re
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_VALUE_DELIMITERS = frozenset(' \t\n\r,]')
+
+
+class JsonArrayDecoder:
+    """
+    Incremental decoder for the items of a top-level JSON array.
+
+    Feed it the body in byte chunks as they arrive, from a blocking or an async
+    response or a file alike; it returns the items completed so far and only
+    buffers the unfinished one.
+    """
+
+    def __init__(self):
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._expected = "["
+        self.done = False
+
+    def feed(self, chunk):
+        """
+        Args:
+            chunk: The next bytes of the body
+
+        Returns:
+            The items completed by this chunk
+        """
+        self._buffer += self._text.decode(chunk)
+        return self._decode(final=False)
+
+    def close(self):
+        """
+        Returns:
+            Any remaining items, after checking that the array was complete
+        """
+        self._buffer += self._text.decode(b"", final=True)
+        items = self._decode(final=True)
+        if not self.done:
+            raise ValueError("Unexpected end of JSON array")
+        return items
+
+    def _decode(self, final):
+        items = []
+        buffer, pos = self._buffer, 0
+        skip_whitespace, raw_decode = _WHITESPACE.match, self._decoder.raw_decode
+        expected = self._expected
+        while not self.done:
+            pos = skip_whitespace(buffer, pos).end()
+            if pos == len(buffer):
+                break
+
+            if expected == "value" or (expected == "first" and buffer[pos] != "]"):
+                try:
+                    item, end = raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break
+                # A number cut by the chunk boundary decodes as a shorter number
+                if not final and (end == len(buffer) or buffer[end] not in _VALUE_DELIMITERS):
+                    break
+                items.append(item)
+                pos = end
+                expected = ","
+            elif expected == "[":
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a top-level JSON array")
+                pos += 1
+                expected = "first"
+            else:
+                if buffer[pos] == "]":
+                    self.done = True
+                elif buffer[pos] != ",":
+                    raise ValueError(f"Expected ',' or ']', got {buffer[pos]!r}")
+                pos += 1
+                expected = "value"
+        self._expected = expected
+        self._buffer = buffer[pos:]
+        return items
@@ -1,4 +1,11 @@
 import sqlite3
+import sys
+from pathlib import Path
+
+if __package__ in (None, ""):
+    # Run as a script: make the sql_queries package importable
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from sql_queries.solution import optimize_schema
 
 DB_FILE = "sql_queries/erp.db"
 
@@ -15,6 +22,7 @@ def setup_database(file):
     conn.commit()
     cur.close()
     conn.close()
+    optimize_schema(DB_FILE)
     print("Database setup completed.")
 
 
@@ -1,46 +1,250 @@
+import functools
 import sqlite3
-from contextlib import closing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
 
 DB_FILE = "sql_queries/erp.db"
 
+# Set on every pooled connection: write-ahead logging (readers never block the writer),
+# fsync only at checkpoints, a 64 MiB page cache, 256 MiB of the file memory-mapped,
+# and temporary tables and indexes (sorts, GROUP BY) kept in memory
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64 * 1024,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3.Connection carrying the depth of nested transaction() blocks."""
+    depth = 0
+
+class ConnectionPool:
+    """
+    One long-lived connection per thread and database file, opened with PRAGMAS.
+
+    Connections run in autocommit mode; transaction() groups statements into a single
+    transaction, committed when the outermost transaction() block exits. Under WAL,
+    other connections keep reading the last committed state until then.
+    """
+    def __init__(self, pragmas=PRAGMAS):
+        self.pragmas = pragmas
+        self._local = threading.local()
+
+    def connection(self, db_file):
+        connections = self._connections()
+        conn = connections.get(db_file)
+        if conn is None:
+            conn = connections[db_file] = sqlite3.connect(db_file, isolation_level=None, factory=PooledConnection)
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    @contextmanager
+    def transaction(self, db_file, immediate=False):
+        """
+        immediate takes the database's write lock up front, waiting for another writer's
+        transaction to end, rather than on the first write, where a transaction that
+        already read can fail with "database is locked". Only the outermost block's counts.
+        """
+        conn = self.connection(db_file)
+        if conn.depth == 0:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        conn.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            conn.depth -= 1
+            if conn.depth == 0:
+                conn.execute("ROLLBACK")
+            raise
+        conn.depth -= 1
+        if conn.depth == 0:
+            conn.execute("COMMIT")
+
+    def close(self):
+        """Closes this thread's connections."""
+        connections = self._connections()
+        for conn in connections.values():
+            conn.close()
+        connections.clear()
+
+    def _connections(self):
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        return connections
+
+pool = ConnectionPool()
+
+# Covering indexes for the reports' access paths: each holds every column its queries
+# read from the table, so they are answered from the index without touching table rows
+INDEXES = {
+    # Joins and GROUP BY on the order (customer sales, sales forecast, discount analysis)
+    "idx_orderdetails_order": "OrderDetails (order_id, product_id, quantity, total_price)",
+    # Joins on the product (top selling products, sales forecast)
+    "idx_orderdetails_product": "OrderDetails (product_id, order_id, quantity)",
+    "idx_orders_customer": "Orders (customer_id, order_id)",
+    # Filter on status and delivery date (late deliveries)
+    "idx_orders_status": "Orders (status, delivery_date, order_date)",
+    "idx_inventory_product": "Inventory (product_id, stock_quantity)",
+}
+
 def get_db_connection(db_file):
-    return sqlite3.connect(db_file)
+    """Returns this thread's pooled connection to db_file."""
+    return pool.connection(db_file)
+
+def optimize_schema(db_file):
+    """Creates the report INDEXES that are missing and refreshes the planner statistics."""
+    with pool.transaction(db_file) as conn:
+        for name, columns in INDEXES.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {columns}")
+        conn.execute("ANALYZE")
+
+def explain_query_plan(db_file, query, params=()):
+    """Returns the steps of the query plan SQLite picks for query."""
+    with closing(get_db_connection(db_file).cursor()) as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+        return [row[3] for row in cursor.fetchall()]
+
+def report_query_plans(db_file, report_builder):
+    """
+    Runs a report builder and returns the query plan of each statement it executed,
+    as (statement, plan steps) pairs, e.g. to look for full table scans ("SCAN Orders")
+    among the steps.
+    """
+    statements = []
+    conn = get_db_connection(db_file)
+    conn.set_trace_callback(statements.append)
+    try:
+        report_builder(db_file)
+    finally:
+        conn.set_trace_callback(None)
+    plans = []
+    for statement in statements:
+        if statement.lstrip().upper().startswith(("SELECT", "WITH", "INSERT")):
+            plans.append((statement, explain_query_plan(db_file, statement)))
+    return plans
+
+def report(func):
+    """
+    Runs a report builder's statements in one write transaction on the pooled connection,
+    so readers see the previous report table until the new one is complete, and a failed
+    refresh leaves it as it was.
+    """
+    @functools.wraps(func)
+    def wrapper(db_file, *args, **kwargs):
+        with pool.transaction(db_file, immediate=True):
+            return func(db_file, *args, **kwargs)
+    return wrapper
 
 def execute_query(db_file, query, params=()):
     """Executes a given SQL query within a database connection."""
-    with closing(get_db_connection(db_file)) as conn, closing(conn.cursor()) as cursor:
+    with pool.transaction(db_file) as conn, closing(conn.cursor()) as cursor:
         cursor.execute(query, params)
-        conn.commit()
 
 def fetch_one(db_file, query, params=()):
     """Fetches a single result from a SQL query."""
-    with closing(get_db_connection(db_file)) as conn, closing(conn.cursor()) as cursor:
+    with closing(get_db_connection(db_file).cursor()) as cursor:
         cursor.execute(query, params)
         return cursor.fetchone()[0]
 
-def get_top_selling_products(db_file):
-    execute_query(db_file, "DROP TABLE IF EXISTS TopSellingProducts")
+# Incremental refreshes (incremental=True) keep running aggregates in side tables and
+# only add the order details and orders past the high-water marks of the last refresh,
+# then recompute the report from the aggregates. The marks are rowids rather than ids:
+# SQLite assigns increasing rowids to inserted rows, while the SERIAL ids are whatever
+# the writer supplied, NULL included. This matches a full rebuild as long as history is
+# append-only: orders are added before their details, and past orders, order details
+# and product prices don't change. Otherwise, call reset_incremental_reports() and the
+# next refresh starts over. Prices, DECIMAL(10,2), are summed as integer cents in both,
+# since float sums would depend on the order the rows are added in.
+INCREMENTAL_TABLES = (
+    "ReportWatermarks",
+    "TopSellingProductsTotals",
+    "CustomerSalesTotals",
+    "SalesForecastDailySales",
+    "DiscountAnalysisOrders",
+)
+
+# Below any rowid: the high-water mark before the first incremental refresh
+NO_WATERMARK = -2 ** 63
+
+def reset_incremental_reports(db_file):
+    """Drops the aggregates and high-water marks of incremental refreshes."""
+    with pool.transaction(db_file):
+        for table in INCREMENTAL_TABLES:
+            execute_query(db_file, f"DROP TABLE IF EXISTS {table}")
+
+def advance_watermarks(db_file, report_table):
+    """
+    Moves the high-water marks of report_table's incremental refresh to the newest order
+    detail and order, and returns the previous and the new marks, each as the rowids of
+    (OrderDetails, Orders). Rows between the two are the ones to add.
+    """
     execute_query(db_file, """
-        CREATE TABLE TopSellingProducts (
+        CREATE TABLE IF NOT EXISTS ReportWatermarks (
+            report TEXT PRIMARY KEY,
+            order_details_rowid INTEGER NOT NULL,
+            orders_rowid INTEGER NOT NULL
+        )
+    """)
+    with closing(get_db_connection(db_file).cursor()) as cursor:
+        cursor.execute("SELECT order_details_rowid, orders_rowid FROM ReportWatermarks WHERE report = ?", (report_table,))
+        last = cursor.fetchone() or (NO_WATERMARK, NO_WATERMARK)
+        cursor.execute("SELECT (SELECT MAX(rowid) FROM OrderDetails), (SELECT MAX(rowid) FROM Orders)")
+        latest = tuple(NO_WATERMARK if mark is None else mark for mark in cursor.fetchone())
+    execute_query(db_file, "INSERT OR REPLACE INTO ReportWatermarks VALUES (?, ?, ?)", (report_table, *latest))
+    return last, latest
+
+@report
+def get_top_selling_products(db_file, incremental=False, schema="main"):
+    order_details = "OrderDetails"
+    if incremental:
+        # Same product_id and quantity columns, one row per product
+        order_details = "TopSellingProductsTotals"
+        update_top_selling_products_totals(db_file)
+    execute_query(db_file, f"DROP TABLE IF EXISTS {schema}.TopSellingProducts")
+    execute_query(db_file, f"""
+        CREATE TABLE {schema}.TopSellingProducts (
             category TEXT,
             name TEXT,
             total_sales REAL,
             sales_rank INTEGER
         )
     """)
-    execute_query(db_file, """
+    execute_query(db_file, f"""
         WITH ProductSales AS (
             SELECT p.category, p.name, SUM(od.quantity) AS total_quantity,
                 RANK() OVER (PARTITION BY p.category ORDER BY SUM(od.quantity) DESC) AS sales_rank
             FROM Products p
-            JOIN OrderDetails od ON p.product_id = od.product_id
+            JOIN {order_details} od ON p.product_id = od.product_id
             GROUP BY p.category, p.name
         )
-        INSERT INTO TopSellingProducts (category, name, total_sales, sales_rank)
+        INSERT INTO {schema}.TopSellingProducts (category, name, total_sales, sales_rank)
         SELECT category, name, ROUND(total_quantity, 2), sales_rank
         FROM ProductSales WHERE sales_rank <= 3
     """)
 
+def update_top_selling_products_totals(db_file):
+    """Adds the order details past the last refresh to the units sold per product in TopSellingProductsTotals."""
+    (last_detail, _), (latest_detail, _) = advance_watermarks(db_file, "TopSellingProducts")
+    execute_query(db_file, """
+        CREATE TABLE IF NOT EXISTS TopSellingProductsTotals (
+            product_id INTEGER PRIMARY KEY,
+            quantity INTEGER NOT NULL
+        )
+    """)
+    execute_query(db_file, """
+        INSERT INTO TopSellingProductsTotals (product_id, quantity)
+        SELECT product_id, SUM(quantity) FROM OrderDetails
+        WHERE rowid > ? AND rowid <= ? AND product_id IS NOT NULL
+        GROUP BY product_id
+        ON CONFLICT (product_id) DO UPDATE SET quantity = quantity + excluded.quantity
+    """, (last_detail, latest_detail))
+
 def get_late_deliveries(db_file):
     return fetch_one(db_file, """
         SELECT ROUND(
@@ -50,10 +254,27 @@ def get_late_deliveries(db_file):
         FROM Orders WHERE status = 'Delivered' AND delivery_date IS NOT NULL
     """) or 0.0
 
-def get_customer_sales_performance(db_file):
-    execute_query(db_file, "DROP TABLE IF EXISTS CustomerSalesPerformance")
-    execute_query(db_file, """
-        CREATE TABLE CustomerSalesPerformance (
+@report
+def get_customer_sales_performance(db_file, incremental=False, schema="main"):
+    # Counts an order once per order detail, and an order without details once
+    customer_revenue = """
+        SELECT c.customer_id, COUNT(o.order_id) AS total_orders,
+            COALESCE(SUM(CAST(ROUND(od.total_price * 100) AS INTEGER)), 0) AS revenue_cents
+        FROM Customers c
+        LEFT JOIN Orders o ON c.customer_id = o.customer_id
+        LEFT JOIN OrderDetails od ON o.order_id = od.order_id
+        GROUP BY c.customer_id HAVING total_orders > 0
+    """
+    if incremental:
+        customer_revenue = """
+            SELECT c.customer_id, t.details + t.orders - t.orders_with_details AS total_orders, t.revenue_cents
+            FROM Customers c JOIN CustomerSalesTotals t ON c.customer_id = t.customer_id
+            WHERE t.orders > 0
+        """
+        update_customer_sales_totals(db_file)
+    execute_query(db_file, f"DROP TABLE IF EXISTS {schema}.CustomerSalesPerformance")
+    execute_query(db_file, f"""
+        CREATE TABLE {schema}.CustomerSalesPerformance (
             customer_id INTEGER,
             total_orders INTEGER,
             total_revenue REAL,
@@ -62,29 +283,67 @@ def get_customer_sales_performance(db_file):
             customer_category TEXT
         )
     """)
-    execute_query(db_file, """
+    execute_query(db_file, f"""
         WITH CustomerRevenue AS (
-            SELECT c.customer_id, COUNT(o.order_id) AS total_orders, COALESCE(SUM(od.total_price), 0) AS total_revenue
-            FROM Customers c
-            LEFT JOIN Orders o ON c.customer_id = o.customer_id
-            LEFT JOIN OrderDetails od ON o.order_id = od.order_id
-            GROUP BY c.customer_id HAVING total_orders > 0
+            SELECT customer_id, total_orders, revenue_cents, revenue_cents / 100.0 AS total_revenue
+            FROM ({customer_revenue})
         ),
-        RevenueStats AS (SELECT AVG(total_revenue) AS avg_revenue FROM CustomerRevenue),
+        RevenueStats AS (SELECT AVG(revenue_cents) AS avg_revenue_cents FROM CustomerRevenue),
         CustomerMetrics AS (
             SELECT cr.customer_id, cr.total_orders, ROUND(cr.total_revenue, 2) AS total_revenue,
                 ROUND(CASE WHEN cr.total_orders > 0 THEN cr.total_revenue / cr.total_orders ELSE 0 END, 2) AS avg_order_value,
-                RANK() OVER (ORDER BY cr.total_revenue DESC) AS revenue_rank,
-                CASE WHEN cr.total_revenue > (SELECT avg_revenue FROM RevenueStats) THEN 'High-Value Customer' ELSE 'Regular Customer' END AS customer_category
+                RANK() OVER (ORDER BY cr.revenue_cents DESC) AS revenue_rank,
+                CASE WHEN cr.revenue_cents > (SELECT avg_revenue_cents FROM RevenueStats) THEN 'High-Value Customer' ELSE 'Regular Customer' END AS customer_category
             FROM CustomerRevenue cr
         )
-        INSERT INTO CustomerSalesPerformance SELECT * FROM CustomerMetrics
+        INSERT INTO {schema}.CustomerSalesPerformance SELECT * FROM CustomerMetrics
     """)
 
-def get_sales_forecast(db_file):
-    execute_query(db_file, "DROP TABLE IF EXISTS SalesForecast")
+def update_customer_sales_totals(db_file):
+    """Adds the orders and order details past the last refresh to CustomerSalesTotals."""
+    (last_detail, last_order), (latest_detail, latest_order) = advance_watermarks(db_file, "CustomerSalesPerformance")
     execute_query(db_file, """
-        CREATE TABLE SalesForecast (
+        CREATE TABLE IF NOT EXISTS CustomerSalesTotals (
+            customer_id INTEGER PRIMARY KEY,
+            orders INTEGER NOT NULL,
+            details INTEGER NOT NULL,
+            orders_with_details INTEGER NOT NULL,
+            revenue_cents INTEGER NOT NULL
+        )
+    """)
+    execute_query(db_file, """
+        INSERT INTO CustomerSalesTotals (customer_id, orders, details, orders_with_details, revenue_cents)
+        SELECT customer_id, COUNT(*), 0, 0, 0 FROM Orders
+        WHERE rowid > ? AND rowid <= ? AND order_id IS NOT NULL AND customer_id IS NOT NULL
+        GROUP BY customer_id
+        ON CONFLICT (customer_id) DO UPDATE SET orders = orders + excluded.orders
+    """, (last_order, latest_order))
+    # An order's first details make it count once per detail rather than once
+    execute_query(db_file, """
+        WITH NewDetails AS (
+            SELECT order_id, COUNT(*) AS details, SUM(CAST(ROUND(total_price * 100) AS INTEGER)) AS revenue_cents
+            FROM OrderDetails WHERE rowid > ? AND rowid <= ?
+            GROUP BY order_id
+        )
+        INSERT INTO CustomerSalesTotals (customer_id, orders, details, orders_with_details, revenue_cents)
+        SELECT o.customer_id, 0, SUM(nd.details),
+            SUM(NOT EXISTS (
+                SELECT 1 FROM OrderDetails od WHERE od.order_id = nd.order_id AND od.rowid <= ?
+            )),
+            SUM(nd.revenue_cents)
+        FROM NewDetails nd JOIN Orders o ON nd.order_id = o.order_id
+        WHERE o.customer_id IS NOT NULL
+        GROUP BY o.customer_id
+        ON CONFLICT (customer_id) DO UPDATE SET details = details + excluded.details,
+            orders_with_details = orders_with_details + excluded.orders_with_details,
+            revenue_cents = revenue_cents + excluded.revenue_cents
+    """, (last_detail, latest_detail, last_detail))
+
+@report
+def get_sales_forecast(db_file, incremental=False, schema="main"):
+    execute_query(db_file, f"DROP TABLE IF EXISTS {schema}.SalesForecast")
+    execute_query(db_file, f"""
+        CREATE TABLE {schema}.SalesForecast (
             product_id INTEGER,
             product_name TEXT,
             stock_quantity INTEGER,
@@ -94,20 +353,29 @@ def get_sales_forecast(db_file):
         )
     """)
     current_date = fetch_one(db_file, "SELECT date('now')")
+    product_sales = f"""
+        SELECT p.product_id, SUM(od.quantity) AS sales_quantity
+        FROM Products p
+        JOIN OrderDetails od ON p.product_id = od.product_id
+        JOIN Orders o ON od.order_id = o.order_id
+        WHERE o.order_date >= date('{current_date}', '-3 months')
+        GROUP BY p.product_id
+    """
+    if incremental:
+        product_sales = f"""
+            SELECT p.product_id, SUM(s.quantity) AS sales_quantity
+            FROM Products p JOIN SalesForecastDailySales s ON p.product_id = s.product_id
+            WHERE s.order_date >= date('{current_date}', '-3 months')
+            GROUP BY p.product_id
+        """
+        update_sales_forecast_daily_sales(db_file, current_date)
     execute_query(db_file, f"""
         WITH ProductStock AS (
             SELECT p.product_id, p.name AS product_name, SUM(i.stock_quantity) AS stock_quantity
             FROM Products p JOIN Inventory i ON p.product_id = i.product_id
             GROUP BY p.product_id
         ),
-        ProductSales AS (
-            SELECT p.product_id, SUM(od.quantity) AS sales_quantity
-            FROM Products p
-            JOIN OrderDetails od ON p.product_id = od.product_id
-            JOIN Orders o ON od.order_id = o.order_id
-            WHERE o.order_date >= date('{current_date}', '-3 months')
-            GROUP BY p.product_id
-        ),
+        ProductSales AS ({product_sales}),
         StockForecast AS (
             SELECT ps.product_id, ps.product_name, ps.stock_quantity,
                 COALESCE(psa.sales_quantity, 0) AS sales_last_3_months,
@@ -115,14 +383,52 @@ def get_sales_forecast(db_file):
                     THEN CAST(ROUND(ps.stock_quantity / (psa.sales_quantity / 3.0)) AS INTEGER) ELSE NULL END AS estimated_months_before_stockout
             FROM ProductStock ps LEFT JOIN ProductSales psa ON ps.product_id = psa.product_id
         )
-        INSERT INTO SalesForecast
+        INSERT INTO {schema}.SalesForecast
         SELECT sf.*, RANK() OVER (ORDER BY sf.stock_quantity DESC) AS stock_rank FROM StockForecast sf
     """)
 
-def get_discount_analysis(db_file):
-    execute_query(db_file, "DROP TABLE IF EXISTS DiscountAnalysis")
+def update_sales_forecast_daily_sales(db_file, current_date):
+    """
+    Adds the order details past the last refresh to the units sold per product and order
+    date in SalesForecastDailySales, which only keeps the dates of the last 3 months.
+    """
+    (last_detail, _), (latest_detail, _) = advance_watermarks(db_file, "SalesForecast")
+    # order_date without a type, so that dates compare exactly as in Orders
+    execute_query(db_file, """
+        CREATE TABLE IF NOT EXISTS SalesForecastDailySales (
+            product_id INTEGER,
+            order_date,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY (product_id, order_date)
+        )
+    """)
     execute_query(db_file, """
-        CREATE TABLE DiscountAnalysis (
+        INSERT INTO SalesForecastDailySales (product_id, order_date, quantity)
+        SELECT od.product_id, o.order_date, SUM(od.quantity)
+        FROM OrderDetails od JOIN Orders o ON od.order_id = o.order_id
+        WHERE od.rowid > ? AND od.rowid <= ? AND od.product_id IS NOT NULL
+            AND o.order_date >= date(?, '-3 months')
+        GROUP BY od.product_id, o.order_date
+        ON CONFLICT (product_id, order_date) DO UPDATE SET quantity = quantity + excluded.quantity
+    """, (last_detail, latest_detail, current_date))
+    execute_query(db_file, "DELETE FROM SalesForecastDailySales WHERE order_date < date(?, '-3 months')",
+                  (current_date,))
+
+@report
+def get_discount_analysis(db_file, incremental=False, schema="main"):
+    order_cents = """
+        SELECT od.order_id, SUM(CAST(ROUND(od.total_price * 100) AS INTEGER)) AS actual_cents,
+            SUM(CAST(ROUND(p.price * 100) AS INTEGER) * od.quantity) AS list_cents
+        FROM OrderDetails od
+        JOIN Products p ON od.product_id = p.product_id
+        GROUP BY od.order_id
+    """
+    if incremental:
+        order_cents = "SELECT order_id, actual_cents, list_cents FROM DiscountAnalysisOrders"
+        update_discount_analysis_orders(db_file)
+    execute_query(db_file, f"DROP TABLE IF EXISTS {schema}.DiscountAnalysis")
+    execute_query(db_file, f"""
+        CREATE TABLE {schema}.DiscountAnalysis (
             order_id INTEGER,
             total_revenue REAL,
             total_cost REAL,
@@ -132,14 +438,11 @@ def get_discount_analysis(db_file):
             profitability_rank INTEGER
         )
     """)
-    execute_query(db_file, """
+    execute_query(db_file, f"""
         WITH OrderMetrics AS (
-            SELECT od.order_id, SUM(od.total_price) AS actual_price,
-                SUM(p.price * od.quantity) AS list_price,
-                SUM(p.price * od.quantity * 0.7) AS cost_price
-            FROM OrderDetails od
-            JOIN Products p ON od.product_id = p.product_id
-            GROUP BY od.order_id
+            SELECT order_id, actual_cents / 100.0 AS actual_price, list_cents / 100.0 AS list_price,
+                list_cents * 0.7 / 100 AS cost_price
+            FROM ({order_cents})
         ),
         OrderAnalysis AS (
             SELECT order_id, ROUND(actual_price, 2) AS total_revenue,
@@ -149,6 +452,80 @@ def get_discount_analysis(db_file):
                 ROUND(CASE WHEN list_price > 0 THEN ((list_price - actual_price) / list_price) * 100 ELSE 0 END, 2) AS discount_percentage
             FROM OrderMetrics
         )
-        INSERT INTO DiscountAnalysis
+        INSERT INTO {schema}.DiscountAnalysis
         SELECT *, RANK() OVER (ORDER BY profit DESC) AS profitability_rank FROM OrderAnalysis
     """)
+
+def update_discount_analysis_orders(db_file):
+    """Adds the order details past the last refresh to the per-order sums in DiscountAnalysisOrders."""
+    (last_detail, _), (latest_detail, _) = advance_watermarks(db_file, "DiscountAnalysis")
+    execute_query(db_file, """
+        CREATE TABLE IF NOT EXISTS DiscountAnalysisOrders (
+            order_id INTEGER PRIMARY KEY,
+            actual_cents INTEGER NOT NULL,
+            list_cents INTEGER NOT NULL
+        )
+    """)
+    execute_query(db_file, """
+        INSERT INTO DiscountAnalysisOrders (order_id, actual_cents, list_cents)
+        SELECT od.order_id, SUM(CAST(ROUND(od.total_price * 100) AS INTEGER)),
+            SUM(CAST(ROUND(p.price * 100) AS INTEGER) * od.quantity)
+        FROM OrderDetails od
+        JOIN Products p ON od.product_id = p.product_id
+        WHERE od.rowid > ? AND od.rowid <= ? AND od.order_id IS NOT NULL
+        GROUP BY od.order_id
+        ON CONFLICT (order_id) DO UPDATE SET actual_cents = actual_cents + excluded.actual_cents,
+            list_cents = list_cents + excluded.list_cents
+    """, (last_detail, latest_detail))
+
+REPORT_TABLES = {
+    get_top_selling_products: "TopSellingProducts",
+    get_customer_sales_performance: "CustomerSalesPerformance",
+    get_sales_forecast: "SalesForecast",
+    get_discount_analysis: "DiscountAnalysis",
+}
+
+def refresh_reports(db_file, incremental=False):
+    """Refreshes every report table in a single transaction, so readers see either all old or all new tables."""
+    with pool.transaction(db_file, immediate=True):
+        for builder in REPORT_TABLES:
+            builder(db_file, incremental=incremental)
+
+def copy_report_table(db_file, table):
+    """Replaces a report table with the temporary one a builder made on this thread's connection (schema="temp")."""
+    with pool.transaction(db_file, immediate=True) as conn:
+        create = conn.execute("SELECT sql FROM sqlite_temp_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+        conn.execute(f"DROP TABLE IF EXISTS main.{table}")
+        conn.execute(create)  # Without a schema, CREATE TABLE goes to main
+        conn.execute(f"INSERT INTO main.{table} SELECT * FROM temp.{table}")
+        conn.execute(f"DROP TABLE temp.{table}")
+
+def run_reports(db_file, workers=5):
+    """
+    Runs the report builders and get_late_deliveries (full rebuilds) concurrently, each on
+    a thread and connection of its own. A builder fills a temporary table under a read
+    transaction, so builders don't wait on each other, then copies it into the database;
+    the copies take turns.
+
+    Returns:
+        {report name: (its return value, seconds to build, seconds to copy)}
+    """
+    copying = threading.Lock()
+
+    def run(report):
+        try:
+            start = time.perf_counter()
+            if report not in REPORT_TABLES:
+                return report(db_file), time.perf_counter() - start, 0.0
+            with pool.transaction(db_file):
+                report(db_file, schema="temp")
+            built = time.perf_counter()
+            with copying:
+                copy_report_table(db_file, REPORT_TABLES[report])
+            return None, built - start, time.perf_counter() - built
+        finally:
+            pool.close()
+
+    reports = [*REPORT_TABLES, get_late_deliveries]
+    with ThreadPoolExecutor(workers) as executor:
+        return dict(zip((report.__name__ for report in reports), executor.map(run, reports)))
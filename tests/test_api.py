@@ -1,8 +1,38 @@
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
 import requests
 
+from aiohttp.test_utils import TestClient, TestServer
+
+from api_rest import async_main
+from api_rest import main as api
+from api_rest.async_main import AsyncErpClient, create_app
+from api_rest.cache import TtlCache
+from api_rest.erp_client import CachedErpClient, ErpClient, ResilientErpClient
+from api_rest.geo import NearestTechnicians, TechnicianIndex, TechnicianIndexCache
+from api_rest.fake_erp import FakeErp, generate_parts, generate_roster
+from api_rest.metrics import ApiMetrics
+from api_rest.resilience import CircuitOpenError
+from data_transformation.streaming import JsonArrayDecoder
+
 url = "http://localhost:3000/api"
 
 
+@pytest.fixture
+def fake_erp(monkeypatch):
+    server = FakeErp()
+    monkeypatch.setattr(api, "erp", ErpClient(server.start(), retries=2, backoff=0))
+    yield server
+    server.stop()
+
+
 def test_request_product():
     answ = requests.get(f"{url}/products", params={"part_id": 1})
     assert answ.status_code == 200
@@ -33,3 +63,383 @@ def test_request_technicians():
 def test_request_technicians_2():
     answ = requests.get(f"{url}/technicians/nearest", params={"sss": 1, "ldat": 4})
     assert answ.status_code == 400
+
+
+def test_products_reuse_pooled_erp_connections(fake_erp):
+    client = api.app.test_client()
+    for _ in range(5):
+        answ = client.get("/api/products", query_string={"part_id": 1})
+        assert answ.status_code == 200
+        assert answ.get_json() == {"id": 1, "type": "A05", "stock": 76, "status": "ok"}
+    assert client.get("/api/products", query_string={"part_id": 33}).status_code == 500
+
+    assert fake_erp.requests == 11
+    assert fake_erp.connections == 1
+
+
+def test_erp_client_retries_transient_failures(fake_erp):
+    fake_erp.fail_next = 2
+    assert api.app.test_client().get("/api/technicians/nearest", query_string={"lat": 54, "lon": 34}).status_code == 200
+    assert fake_erp.requests == 3
+
+    fake_erp.fail_next = 3
+    assert api.erp.get("/technicians/available").status_code == 503
+
+
+def test_ttl_cache_expires_evicts_and_serves_stale():
+    now = [0.0]
+    cache = TtlCache(max_entries=2, clock=lambda: now[0])
+    loads = []
+
+    def loader(value):
+        loads.append(value)
+        return value
+
+    assert cache.get("a", lambda: loader(1), ttl=10) == 1
+    assert cache.get("a", lambda: loader(2), ttl=10) == 1
+    now[0] = 11
+    assert cache.get("a", lambda: loader(3), ttl=10) == 3
+    cache.get("b", lambda: loader("b"), ttl=10)
+    cache.get("c", lambda: loader("c"), ttl=10)
+    assert cache.get("a", lambda: loader(4), ttl=10, stale_ttl=10) == 4
+
+    # Expired but within the stale window: the old value is served while it refreshes
+    now[0] = 25
+    assert cache.get("a", lambda: loader(5), ttl=10, stale_ttl=10) == 4
+    for _ in range(100):
+        if cache.get("a", lambda: loader(6), ttl=10, stale_ttl=10) == 5:
+            break
+        time.sleep(0.01)
+    assert loads == [1, 3, "b", "c", 4, 5]
+    assert cache.stats()["evictions"] == 2
+
+
+def test_ttl_cache_coalesces_concurrent_misses():
+    cache = TtlCache()
+    release = threading.Event()
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("k", slow_loader, ttl=60)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while cache.stats()["misses"] + cache.stats()["coalesced"] < 8:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ["value"] * 8
+    assert cache.stats()["coalesced"] == 7
+
+
+def test_cached_erp_client_skips_repeat_calls(fake_erp, monkeypatch):
+    monkeypatch.setattr(api, "erp", CachedErpClient(api.erp, TtlCache()))
+    client = api.app.test_client()
+    for part_id in (1, 3, 1, 33, 33):
+        client.get("/api/products", query_string={"part_id": part_id})
+
+    # parts 1 and 3 share stock type A05; the not-found part 33 is never cached
+    assert fake_erp.requests == 5
+    stats = client.get("/api/cache/stats").get_json()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (3, 5, 3)
+
+
+def test_async_app_matches_flask_contract(fake_erp):
+    queries = [
+        ("/api/products", {"part_id": 1}),
+        ("/api/products", {"part_id": 33}),
+        ("/api/products", {}),
+        ("/api/products", {"part_id": "abc"}),
+        ("/api/technicians/nearest", {"lat": 54, "lon": 34}),
+        ("/api/technicians/nearest", {"lat": "north", "lon": 34}),
+        ("/api/technicians/nearest", {"sss": 1, "ldat": 4}),
+    ]
+    flask_client = api.app.test_client()
+    expected = []
+    for path, params in queries:
+        answ = flask_client.get(path, query_string=params)
+        expected.append((answ.status_code, answ.get_json()))
+
+    async def fetch_all():
+        async with TestClient(TestServer(create_app(AsyncErpClient(fake_erp.url)))) as client:
+            results = []
+            for path, params in queries:
+                answ = await client.get(path, params=params)
+                results.append((answ.status, await answ.json()))
+            return results
+
+    assert asyncio.run(fetch_all()) == expected
+
+
+def test_async_app_indexes_the_roster_off_the_event_loop(fake_erp, monkeypatch):
+    indexes = TechnicianIndexCache()
+    threads = []
+    get = indexes.get
+    monkeypatch.setattr(indexes, "get", lambda response: threads.append(threading.get_ident()) or get(response))
+    monkeypatch.setattr(async_main, "technician_indexes", indexes)
+
+    async def fetch():
+        async with TestClient(TestServer(create_app(AsyncErpClient(fake_erp.url)))) as client:
+            for _ in range(3):
+                answ = await client.get("/api/technicians/nearest", params={"lat": 54, "lon": 34})
+                assert answ.status == 200
+            return threading.get_ident()
+
+    loop_thread = asyncio.run(fetch())
+    assert len(threads) == 3 and loop_thread not in threads
+    # Fresh response objects with the same roster reuse the index
+    assert indexes.builds == 1
+
+
+def test_batch_products_match_single_lookups_and_dedupe_calls(fake_erp):
+    client = api.app.test_client()
+    part_ids = [1, 2, 3, 33, 1]
+    expected = [client.get("/api/products", query_string={"part_id": part_id}) for part_id in part_ids]
+    fake_erp.requests = 0
+
+    answ = client.post("/api/products/batch", json={"part_ids": part_ids})
+    assert answ.status_code == 200
+    body = answ.get_json()
+    assert body["errors"] == 1
+    for result, single in zip(body["results"], expected):
+        assert result["status_code"] == single.status_code
+        assert result.get("product", single.get_json()) == single.get_json()
+        assert result.get("error") == single.get_json().get("error")
+
+    # Parts 1, 2, 3 and 33, then stock types A05 (parts 1 and 3) and B12
+    assert fake_erp.requests == 6
+    assert client.get("/api/products/batch", query_string={"part_ids": "1,2"}).get_json()["errors"] == 0
+    assert client.post("/api/products/batch", json={}).status_code == 400
+
+    # Empty ids get the single endpoint's 400, per item, without an ERP call
+    missing = {"part_id": "", "status_code": 400, "error": client.get("/api/products").get_json()["error"]}
+    body = client.get("/api/products/batch", query_string={"part_ids": "1,,2"}).get_json()
+    assert body["errors"] == 1 and body["results"][1] == missing
+    fake_erp.requests = 0
+    body = client.post("/api/products/batch", json={"part_ids": ["", None, " "]}).get_json()
+    assert body == {"results": [missing] * 3, "errors": 3}
+    assert fake_erp.requests == 0
+
+
+def test_technician_index_matches_brute_force_ranking():
+    rng = random.Random(7)
+    technicians = [
+        {"id": str(i), "name": f"Tech {i}", "latitude": rng.uniform(-90, 90), "longitude": rng.uniform(-180, 180)}
+        for i in range(2000)
+    ]
+    # Technicians sharing a location tie on distance and must keep their roster order
+    technicians += [dict(tech, id=str(5000 + i)) for i, tech in enumerate(technicians[:50])]
+    index = TechnicianIndex(technicians)
+
+    # k = 100 and more take the vectorized path, smaller k the tree
+    for _ in range(100):
+        lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        for k in (1, 2, 5, 100):
+            assert index.nearest(lat, lon, k) == api.nearest_technicians(technicians, lat, lon, k)
+        expected = [tech for tech in api.nearest_technicians(technicians, lat, lon, 100) if tech["distance_km"] <= 500]
+        assert index.nearest(lat, lon, 100, max_km=500) == expected
+    lat, lon = technicians[3]["latitude"], technicians[3]["longitude"]
+    assert [tech["id"] for tech in index.nearest(lat, lon, 2)] == [3, 5003]
+    assert TechnicianIndex([]).nearest(0, 0) == []
+
+
+def test_technician_index_is_rebuilt_only_when_the_roster_changes(fake_erp, monkeypatch):
+    monkeypatch.setattr(api, "technician_indexes", TechnicianIndexCache())
+    client = api.app.test_client()
+    for _ in range(3):
+        assert client.get("/api/technicians/nearest", query_string={"lat": 54, "lon": 34}).status_code == 200
+    assert api.technician_indexes.builds == 1
+
+    fake_erp.technicians = fake_erp.technicians[1:]
+    assert client.get("/api/technicians/nearest", query_string={"lat": 54, "lon": 34}).get_json()[0]["id"] != 1
+    assert api.technician_indexes.builds == 2
+
+
+def test_nearest_technicians_k_and_max_km_parameters(fake_erp):
+    client = api.app.test_client()
+    everyone = client.get("/api/technicians/nearest", query_string={"lat": 54, "lon": 34, "k": 10}).get_json()
+    assert len(everyone) == len(fake_erp.technicians)
+    assert everyone[:2] == client.get("/api/technicians/nearest", query_string={"lat": 54, "lon": 34}).get_json()
+
+    max_km = everyone[2]["distance_km"]
+    nearby = client.get("/api/technicians/nearest", query_string={"lat": 54, "lon": 34, "k": 10, "max_km": max_km})
+    assert nearby.get_json() == everyone[:3]
+
+    for params in ({"k": 0}, {"k": "two"}, {"max_km": -1}, {"k": 1000}):
+        answ = client.get("/api/technicians/nearest", query_string={"lat": 54, "lon": 34, **params})
+        assert answ.status_code == 400
+
+
+def test_streamed_roster_ranking_matches_brute_force(fake_erp, monkeypatch):
+    rng = random.Random(11)
+    fake_erp.technicians = [
+        {"id": str(i), "name": f"Tech {i}", "latitude": rng.uniform(-90, 90), "longitude": rng.uniform(-180, 180)}
+        for i in range(3000)
+    ]
+    body = json.dumps(fake_erp.technicians, indent=1).encode("utf-8")
+    for chunk_size in (1, 7, 4096):
+        decoder = JsonArrayDecoder()
+        technicians = [tech for i in range(0, len(body), chunk_size) for tech in decoder.feed(body[i:i + chunk_size])]
+        assert technicians + decoder.close() == fake_erp.technicians
+
+    nearest = NearestTechnicians(54, 34, k=5)
+    nearest.add(fake_erp.technicians)
+    assert nearest.result() == api.nearest_technicians(fake_erp.technicians, 54, 34, 5)
+
+    monkeypatch.setattr(api, "STREAM_TECHNICIANS", True)
+    monkeypatch.setattr(async_main, "STREAM_TECHNICIANS", True)
+    params = {"lat": 54, "lon": 34, "k": 5, "max_km": 2000}
+    expected = [tech for tech in nearest.result() if tech["distance_km"] <= 2000]
+    assert api.app.test_client().get("/api/technicians/nearest", query_string=params).get_json() == expected
+
+    async def fetch():
+        async with TestClient(TestServer(create_app(AsyncErpClient(fake_erp.url)))) as client:
+            return await (await client.get("/api/technicians/nearest", params=params)).json()
+
+    assert asyncio.run(fetch()) == expected
+
+
+def test_metrics_endpoint_reports_routes_erp_calls_and_cache(fake_erp, monkeypatch):
+    metrics = ApiMetrics()
+    metrics.add_collector(api.collect_metrics)
+    monkeypatch.setattr(api, "registry", metrics)
+    monkeypatch.setattr(async_main, "registry", metrics)
+    monkeypatch.setattr(api, "erp", CachedErpClient(ErpClient(fake_erp.url, backoff=0, metrics=metrics), TtlCache()))
+    client = api.app.test_client()
+    for part_id in (1, 1, 33):
+        client.get("/api/products", query_string={"part_id": part_id})
+    client.get("/api/technicians/nearest", query_string={"lat": 54})
+
+    answ = client.get("/metrics")
+    assert answ.status_code == 200
+    assert answ.content_type.startswith("text/plain; version=0.0.4")
+    lines = answ.get_data(as_text=True).splitlines()
+    for sample in (
+        'erp_api_request_duration_seconds_count{route="/api/products",method="GET"} 3',
+        'erp_api_responses_total{route="/api/products",method="GET",status="200"} 2',
+        'erp_api_responses_total{route="/api/products",method="GET",status="500"} 1',
+        'erp_api_responses_total{route="/api/technicians/nearest",method="GET",status="400"} 1',
+        'erp_api_erp_request_duration_seconds_count{endpoint="parts"} 2',
+        'erp_api_erp_responses_total{endpoint="parts",status="404"} 1',
+        'erp_api_erp_responses_total{endpoint="stock",status="200"} 1',
+        'erp_api_cache_lookups_total{result="hits"} 2',
+    ):
+        assert sample in lines
+
+    async def scrape():
+        async with TestClient(TestServer(create_app(AsyncErpClient(fake_erp.url, metrics=metrics)))) as client:
+            await client.get("/api/products", params={"part_id": 2})
+            await client.get("/nowhere")
+            return await (await client.get("/metrics")).text()
+
+    lines = asyncio.run(scrape()).splitlines()
+    assert 'erp_api_responses_total{route="/nowhere",method="GET",status="404"} 1' not in lines
+    assert 'erp_api_responses_total{route="<unmatched>",method="GET",status="404"} 1' in lines
+    assert 'erp_api_erp_responses_total{endpoint="stock",status="200"} 2' in lines
+
+
+def test_async_app_runs_without_the_flask_app():
+    # In a fresh interpreter, since this module has imported the Flask app already
+    script = (
+        "import sys\n"
+        "from api_rest.async_main import registry\n"
+        "assert 'api_rest.main' not in sys.modules and 'flask' not in sys.modules\n"
+        "print(registry.to_prometheus())\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    assert "erp_api_technician_index_builds_total 0" in result.stdout.splitlines()
+    assert "erp_api_cache_" not in result.stdout and "erp_api_circuit_" not in result.stdout
+
+
+def test_fake_erp_simulates_errors_latency_and_large_datasets():
+    parts, stock = generate_parts(500, types=5)
+    assert len(parts) == 500 and parts["1"] == {"part_id": "1", "type": "A05", "status": "ok"}
+    assert all(part["type"] in stock for part in parts.values())
+    assert generate_roster(100) == generate_roster(100) != generate_roster(100, seed=1)
+
+    server = FakeErp(parts=parts, stock=stock, technicians=generate_roster(2000), error_rate=0.25,
+                     latencies={"technicians": 0.05}, seed=3)
+    erp = ErpClient(server.start(), retries=0, metrics=None)
+    try:
+        statuses = [erp.get(f"/parts/{i}").status_code for i in range(1, 201)]
+        assert 30 < statuses.count(503) < 70
+        assert set(statuses) == {200, 503}
+
+        server.error_rate = 0
+        start = time.perf_counter()
+        assert len(erp.get("/technicians/available").json()) == 2000
+        assert time.perf_counter() - start >= 0.05
+    finally:
+        server.stop()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_circuit_breaker_fails_fast_and_falls_back_to_cached_data(fake_erp, monkeypatch):
+    clock = FakeClock()
+    breaker = {"failure_ratio": 0.5, "slow_call_seconds": 1.0, "window": 4, "min_calls": 4, "open_seconds": 5,
+               "clock": clock}
+    guard = ResilientErpClient(ErpClient(fake_erp.url, retries=0, metrics=None), breaker=breaker)
+    erp = CachedErpClient(guard, TtlCache(clock=clock), ttls={"/parts/": 10, "/stock/": 10}, stale_ttl=0)
+    monkeypatch.setattr(api, "erp", erp)
+    client = api.app.test_client()
+    assert client.get("/api/products", query_string={"part_id": 1}).status_code == 200
+
+    # With the earlier success, three failures make half of the last four calls
+    fake_erp.error_rate = 1.0
+    for _ in range(3):
+        assert guard.get("/stock/B12").status_code == 503
+    assert guard.breakers["stock"].state == "open"
+    assert guard.breakers["parts"].state == "closed"
+    requests_before = fake_erp.requests
+    with pytest.raises(CircuitOpenError):
+        guard.get("/stock/B12")
+    assert fake_erp.requests == requests_before
+
+    # Part 1 and its stock expired, but the last answers are served while the ERP is down
+    clock.now = 20
+    answ = client.get("/api/products", query_string={"part_id": 1})
+    assert answ.status_code == 200 and answ.get_json()["stock"] == 76
+    assert erp.stats()["fallbacks"] == 2
+    assert client.get("/api/products", query_string={"part_id": 2}).status_code == 500
+
+    # After open_seconds a single probe goes through; once it succeeds the circuit closes
+    fake_erp.error_rate = 0
+    clock.now = 30
+    assert guard.get("/stock/B12").status_code == 200
+    assert guard.breakers["stock"].state == "closed"
+    assert guard.stats()["breakers"]["stock"]["rejections"] >= 1
+
+
+def test_hedged_request_answers_before_a_slow_erp_call(fake_erp):
+    guard = ResilientErpClient(ErpClient(fake_erp.url, metrics=None), hedge=True, hedge_min_delay=0.02,
+                               hedge_budget=0.5)
+    try:
+        for _ in range(40):
+            guard.get("/parts/1")
+        assert guard.stats()["hedges"] == 0
+
+        fake_erp.slow_latency = 1.0
+        fake_erp.slow_next = 1
+        requests_before = fake_erp.requests
+        start = time.perf_counter()
+        assert guard.get("/parts/1").json()["part_id"] == "1"
+        assert time.perf_counter() - start < 0.5
+        assert fake_erp.requests == requests_before + 2
+        assert guard.stats()["hedge_wins"] == 1
+    finally:
+        guard.close()
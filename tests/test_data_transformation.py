@@ -1,13 +1,27 @@
 from pathlib import Path
 from datetime import date
+import json
 import os
 
+import pytest
+
 from data_transformation.main import (
+    AmountParser,
     ConfigLoader,
+    DateParser,
+    StatusNormalizer,
     Transaction,
     ItemDetail,
+    iter_json_records,
+    main,
     parse_json_to_csv,
+    transform_records,
 )
+from data_transformation.columnar import parse_json_to_csv_columnar
+from data_transformation.parallel import parse_json_to_csv_parallel
+from data_transformation.incremental import parse_json_to_csv_incremental
+from data_transformation.metrics import PipelineMetrics
+from data_transformation.sinks import Sink, open_sink
 
 data_path = "data_transformation/inputs/records.json"
 config_path = "data_transformation/config.yml"
@@ -108,3 +122,266 @@ def test_parse_json_to_csv_outputs_transactions():
 
         assert header == expected_header, "Details header mismatch"
         assert data == expected_data, "Details data mismatch"
+
+
+def test_iter_json_records_across_chunk_boundaries(tmp_path):
+    records = [{"id": "001", "items": [{"price": "1,200.50"}]}, 12345, -1.5e3, "[,]", None, "Zoë €"]
+    json_file = tmp_path / "records.json"
+    json_file.write_text(json.dumps(records, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    for chunk_size in (1, 2, 7, 1 << 16):
+        assert list(iter_json_records(json_file, chunk_size)) == records
+
+    json_file.write_text(json.dumps(records)[:-1], encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_records(json_file, 7))
+
+
+def test_parse_json_to_csv_streaming_matches_in_memory(tmp_path):
+    config = ConfigLoader(Path(config_path))
+    with open(data_path, "r", encoding="utf-8") as f:
+        json_data = json.load(f)
+
+    parse_json_to_csv(json_data, tmp_path / "t_load.csv", tmp_path / "d_load.csv", config)
+    parse_json_to_csv(iter_json_records(Path(data_path), chunk_size=64),
+                      tmp_path / "t_stream.csv", tmp_path / "d_stream.csv", config)
+
+    assert (tmp_path / "t_load.csv").read_bytes() == (tmp_path / "t_stream.csv").read_bytes()
+    assert (tmp_path / "d_load.csv").read_bytes() == (tmp_path / "d_stream.csv").read_bytes()
+
+
+def test_field_plan_tries_each_alias_and_nested_paths():
+    config = ConfigLoader(Path(config_path))
+    plan = config.field_plan
+
+    assert plan.resolve({"ID": "007", "client_name": "Ann", "order_date": "2024-01-10",
+                         "amount_due": "5", "status": "Paid"}) == ("007", "Ann", "2024-01-10", "5", "Paid")
+    assert plan.resolve({"order_no": 4, "buyer": {"full_name": "Alice Brown"}})[:2] == (4, "Alice Brown")
+    # Missing or null values fall through to the next alias, then to the default
+    assert plan.resolve({"id": None, "ID": 2, "buyer": "n/a"}) == (2, "", "", 0, "Unknown")
+
+    # Records of the last shape reuse its getter; any other set of keys gets its own
+    assert plan.resolve({"id": 3, "customer": "Bo"}) == (3, "Bo", "", 0, "Unknown")
+    assert plan.resolve({"customer": "Cy", "id": None}) == (0, "Cy", "", 0, "Unknown")
+    assert plan.resolve({"id": None, "customer": "Di", "ID": 5}) == (5, "Di", "", 0, "Unknown")
+    assert plan.resolve({"customer": "Ed", "total": 7}) == (0, "Ed", "", 7, "Unknown")
+    # A record changed in place after being resolved is not mistaken for its old shape
+    entry = {"id": 8, "customer": "Flo"}
+    assert plan.resolve(entry) == (8, "Flo", "", 0, "Unknown")
+    del entry["customer"]
+    entry["client_name"] = "Gus"
+    assert plan.resolve(entry) == (8, "Gus", "", 0, "Unknown")
+
+
+def test_transform_records_survives_an_empty_first_record():
+    config = ConfigLoader(Path(config_path))
+
+    # The empty record resolves to the field defaults, and the run goes on
+    transactions = [transaction for transaction, _ in transform_records([{}, {"id": 1}], config)]
+    assert [transaction.transaction_id for transaction in transactions] == [0, 1]
+
+
+def test_date_parser_learns_formats_and_falls_back_to_today():
+    config = ConfigLoader(Path(config_path))
+    parser = DateParser(config.get("date_formats"))
+
+    assert parser("2024-01-10") == date(2024, 1, 10)
+    assert parser("March 6, 2024") == date(2024, 3, 6)
+    assert parser.formats[0] == "%B %d, %Y"
+    assert parser(" 07-03-2024 ") == date(2024, 3, 7)
+    assert parser("2024-13-45") == date.today()
+    assert parser("") == date.today()
+    assert parser.fallbacks == 2
+
+
+def test_amount_parser_handles_separators_and_currencies():
+    parser = ConfigLoader(Path(config_path)).amount_parser
+
+    assert parser(780.25) == 780.25
+    assert parser("1,200.50€") == 1200.5
+    assert parser("€1.500,75") == 1500.75
+    assert parser("1 250.50 EUR") == 1250.5
+    assert parser("1.234.567") == 1234567.0
+    assert parser("12,5") == 12.5
+    assert parser("-5,00 €") == -5.0
+    assert parser("n/a") == 0.0
+    assert parser.fallbacks == 1
+
+    european = AmountParser(decimal_separator=",")
+    assert european("1.500") == 1500.0
+    assert european("1.500,75") == 1500.75
+    assert AmountParser(thousands_separator=".").decimal_separator == ","
+
+
+def test_columnar_backend_matches_row_backend(tmp_path):
+    config = ConfigLoader(Path(config_path))
+    with open(data_path, "r", encoding="utf-8") as f:
+        json_data = json.load(f)
+    # An invalid status drops the whole entry in both backends
+    json_data.insert(3, {"id": 99, "status": {"code": 1}, "items": [{"item": "Lost", "price": 1}]})
+
+    parse_json_to_csv(json_data, tmp_path / "t_rows.csv", tmp_path / "d_rows.csv", config)
+    parse_json_to_csv_columnar(json_data, tmp_path / "t_cols.csv", tmp_path / "d_cols.csv", config, batch_size=4)
+
+    assert (tmp_path / "t_rows.csv").read_bytes() == (tmp_path / "t_cols.csv").read_bytes()
+    assert (tmp_path / "d_rows.csv").read_bytes() == (tmp_path / "d_cols.csv").read_bytes()
+    assert "Lost" not in (tmp_path / "d_cols.csv").read_text()
+
+
+def test_parallel_backend_matches_serial_details_ids(tmp_path):
+    config = ConfigLoader(Path(config_path))
+    with open(data_path, "r", encoding="utf-8") as f:
+        json_data = json.load(f)
+
+    parse_json_to_csv(json_data, tmp_path / "t_rows.csv", tmp_path / "d_rows.csv", config)
+    counts = parse_json_to_csv_parallel(json_data, tmp_path / "t_par.csv", tmp_path / "d_par.csv", config,
+                                        workers=2, shard_size=2)
+
+    assert counts == (9, 11)
+    assert (tmp_path / "t_rows.csv").read_bytes() == (tmp_path / "t_par.csv").read_bytes()
+    assert (tmp_path / "d_rows.csv").read_bytes() == (tmp_path / "d_par.csv").read_bytes()
+
+
+def test_incremental_run_appends_only_new_entries(tmp_path):
+    config = ConfigLoader(Path(config_path))
+    with open(data_path, "r", encoding="utf-8") as f:
+        json_data = json.load(f)
+    transaction_file, details_file = tmp_path / "t.csv", tmp_path / "d.csv"
+    manifest_file = tmp_path / "manifest.json"
+
+    assert parse_json_to_csv_incremental(json_data[:5], transaction_file, details_file,
+                                         manifest_file, config) == (5, 5)
+    assert parse_json_to_csv_incremental(json_data[:5], transaction_file, details_file,
+                                         manifest_file, config) == (0, 0)
+    # Rows left behind by an interrupted run are discarded before appending
+    with details_file.open("a") as f:
+        f.write("99,partial")
+    assert parse_json_to_csv_incremental(json_data, transaction_file, details_file,
+                                         manifest_file, config) == (4, 6)
+
+    parse_json_to_csv(json_data, tmp_path / "t_full.csv", tmp_path / "d_full.csv", config)
+    assert transaction_file.read_bytes() == (tmp_path / "t_full.csv").read_bytes()
+    assert details_file.read_bytes() == (tmp_path / "d_full.csv").read_bytes()
+
+    assert parse_json_to_csv_incremental(json_data, transaction_file, details_file, manifest_file,
+                                         config, full_rebuild=True) == (9, 11)
+    assert details_file.read_bytes() == (tmp_path / "d_full.csv").read_bytes()
+
+
+def test_interrupted_rebuild_is_rebuilt_on_the_next_run(tmp_path):
+    config = ConfigLoader(Path(config_path))
+    with open(data_path, "r", encoding="utf-8") as f:
+        json_data = json.load(f)
+    transaction_file, details_file = tmp_path / "t.csv", tmp_path / "d.csv"
+    manifest_file = tmp_path / "manifest.json"
+    parse_json_to_csv_incremental(json_data[:3], transaction_file, details_file, manifest_file, config)
+
+    changed = [{**entry, "status": "Pending"} for entry in json_data[:6]]
+
+    def crashing():
+        yield from changed
+        raise RuntimeError("interrupted")
+
+    with pytest.raises(RuntimeError):
+        parse_json_to_csv_incremental(crashing(), transaction_file, details_file, manifest_file, config,
+                                      full_rebuild=True)
+    assert not manifest_file.exists()
+
+    assert parse_json_to_csv_incremental(changed, transaction_file, details_file, manifest_file, config) == (6, 6)
+    parse_json_to_csv(changed, tmp_path / "t_full.csv", tmp_path / "d_full.csv", config)
+    assert transaction_file.read_bytes() == (tmp_path / "t_full.csv").read_bytes()
+    assert details_file.read_bytes() == (tmp_path / "d_full.csv").read_bytes()
+
+
+@pytest.mark.parametrize("output", ["t.parquet", "t.arrow"])
+def test_incremental_runs_reject_outputs_that_cannot_be_appended_to(tmp_path, output):
+    config_file = tmp_path / "config.yml"
+    config_file.write_text(Path(config_path).read_text().replace(
+        "data_transformation/outputs/transactions.csv", str(tmp_path / output)))
+
+    with pytest.raises(SystemExit) as e:
+        main(["--config", str(config_file), "--incremental"])
+    assert e.value.code == 2
+    assert not (tmp_path / output).exists()
+
+
+def test_status_normalizer_maps_synonyms_and_counts_unmapped():
+    config = ConfigLoader(Path(config_path))
+    mapping = config.get("status_mapping")
+    normalizer = config.status_normalizer
+
+    assert normalizer(" Complete") == "Completed"
+    assert normalizer("PAID") == "Completed"
+    assert normalizer("in progress") == "Pending"
+    assert normalizer("Refunded") == "Refunded"
+    assert StatusNormalizer(mapping, "default")("Refunded") == "Unknown"
+    assert StatusNormalizer(mapping, "reject")("Refunded") is None
+    assert normalizer.unmapped == {"Refunded": 1}
+
+
+def test_unmapped_statuses_are_counted_across_parallel_workers(tmp_path):
+    config = ConfigLoader(Path(config_path))
+    json_data = [{"id": i, "status": "Refunded" if i % 2 else "paid"} for i in range(10)]
+
+    parse_json_to_csv_parallel(json_data, tmp_path / "t.csv", tmp_path / "d.csv", config,
+                               workers=2, shard_size=3)
+
+    assert config.status_normalizer.unmapped == {"Refunded": 5}
+
+
+def test_compressed_and_columnar_sinks_round_trip(tmp_path):
+    import gzip
+    import pyarrow.parquet
+    import zstandard
+
+    rows = [(1, 11, "Laptop", 1, 1200.5), (2, 11, "Mouse, wireless", 2, 25.0)]
+    for suffix in (".csv", ".csv.gz", ".csv.zst", ".parquet"):
+        with open_sink(tmp_path / f"details{suffix}", ItemDetail, batch_size=1) as sink:
+            sink.write_many(rows)
+
+    expected = (tmp_path / "details.csv").read_bytes()
+    assert gzip.decompress((tmp_path / "details.csv.gz").read_bytes()) == expected
+    with zstandard.open(tmp_path / "details.csv.zst", "rb") as f:
+        assert f.read() == expected
+
+    table = pyarrow.parquet.read_table(tmp_path / "details.parquet")
+    assert table.column_names == list(ItemDetail.model_fields)
+    assert table.column("price").to_pylist() == [1200.5, 25.0]
+    assert table.column("transaction_id").to_pylist() == ["11", "11"]
+
+
+def test_sink_subclasses_must_implement_writing_and_closing(tmp_path):
+    class NoClose(Sink):
+        def _write_batch(self, rows):
+            pass
+
+    with pytest.raises(TypeError):
+        NoClose(tmp_path / "details.out", ItemDetail)
+
+
+def test_pipeline_metrics_count_stages_and_fallbacks(tmp_path):
+    config = ConfigLoader(Path(config_path))
+    with open(data_path, "r", encoding="utf-8") as f:
+        json_data = json.load(f)
+    json_data.append({"id": 99, "date": "not a date", "amount": "n/a", "status": "Refunded"})
+    json_data.append({"id": 100, "date": "2024-03-07", "status": {"code": 1}})
+
+    for backend in (parse_json_to_csv, parse_json_to_csv_columnar):
+        metrics = PipelineMetrics()
+        backend(json_data, tmp_path / "t.csv", tmp_path / "d.csv", config, metrics=metrics)
+
+        stages = metrics.to_dict()["stages"]
+        assert (metrics.records, metrics.transactions, metrics.details) == (11, 10, 11)
+        assert stages["json_parse"]["calls"] == 11
+        assert stages["validation"]["errors"] == 1
+        assert stages["date_parse"]["fallbacks"] == 1
+        assert stages["amount_parse"]["fallbacks"] == 1
+        assert stages["status_normalization"]["fallbacks"] == 2
+        assert stages["write"]["calls"] == 2
+
+    metrics.export(tmp_path / "metrics.prom")
+    prometheus = (tmp_path / "metrics.prom").read_text()
+    assert 'erp_pipeline_stage_errors_total{stage="validation"} 1' in prometheus
+    assert "erp_pipeline_records_total 11" in prometheus
+    metrics.export(tmp_path / "metrics.json")
+    assert json.loads((tmp_path / "metrics.json").read_text())["records"] == 11
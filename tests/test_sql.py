@@ -1,4 +1,10 @@
+import shutil
 import sqlite3
+import threading
+
+import pytest
+
+from sql_queries import solution
 from sql_queries.solution import (
     get_customer_sales_performance,
     get_discount_analysis,
@@ -305,3 +311,205 @@ def test_4_discount_analysis_data():
     ]
 
     compare_rows(actual_rows, expected_rows)
+
+
+# --------------------------- #
+#  Test: Connection Pool
+# --------------------------- #
+
+
+def test_reports_share_a_pooled_connection_per_thread(tmp_path):
+    db_file = str(tmp_path / "erp.db")
+    shutil.copy(DB_FILE, db_file)
+    try:
+        conn = solution.get_db_connection(db_file)
+        get_top_selling_products(db_file)
+        get_sales_forecast(db_file)
+        assert get_late_deliveries(db_file) > 0
+        assert solution.get_db_connection(db_file) is conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(solution.get_db_connection(db_file)))
+        thread.start()
+        thread.join()
+        assert other[0] is not conn
+
+        # A report's statements commit together or not at all
+        rows = fetch_data_from_db_file(db_file, "SELECT * FROM TopSellingProducts")
+        with pytest.raises(sqlite3.OperationalError):
+            with solution.pool.transaction(db_file):
+                solution.execute_query(db_file, "DROP TABLE TopSellingProducts")
+                solution.execute_query(db_file, "SELECT * FROM NoSuchTable")
+        assert fetch_data_from_db_file(db_file, "SELECT * FROM TopSellingProducts") == rows
+    finally:
+        solution.pool.close()
+
+
+def fetch_data_from_db_file(db_file, query):
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute(query).fetchall()
+    finally:
+        conn.close()
+
+
+# --------------------------- #
+#  Test: Report Indexes
+# --------------------------- #
+
+
+def test_reports_read_the_large_tables_through_indexes(tmp_path):
+    db_file = str(tmp_path / "erp.db")
+    shutil.copy(DB_FILE, db_file)
+    reports = [get_top_selling_products, get_late_deliveries, get_customer_sales_performance,
+               get_sales_forecast, get_discount_analysis]
+    try:
+        solution.optimize_schema(db_file)
+        solution.optimize_schema(db_file)  # Idempotent
+        indexes = fetch_data_from_db_file(db_file, "SELECT name FROM sqlite_master WHERE type = 'index'")
+        assert set(solution.INDEXES) <= {name for name, in indexes}
+        assert fetch_data_from_db_file(db_file, "SELECT COUNT(*) FROM sqlite_stat1")[0][0] > 0
+
+        for report in reports:
+            for statement, plan in solution.report_query_plans(db_file, report):
+                for step in plan:
+                    for table in ("OrderDetails", "Orders", "Inventory", "od", "o", "i"):
+                        if step == f"SCAN {table}" or step.startswith(f"SCAN {table} "):
+                            assert "COVERING INDEX" in step, (report.__name__, step)
+        # Same results as without the indexes
+        assert get_late_deliveries(db_file) == get_late_deliveries(DB_FILE)
+    finally:
+        solution.pool.close()
+
+
+# --------------------------- #
+#  Test: Incremental Refresh
+# --------------------------- #
+
+
+def test_incremental_refresh_matches_a_full_rebuild(tmp_path):
+    db_file = str(tmp_path / "erp.db")
+    shutil.copy(DB_FILE, db_file)
+    reports = {
+        get_top_selling_products: "TopSellingProducts",
+        get_customer_sales_performance: "CustomerSalesPerformance",
+        get_sales_forecast: "SalesForecast",
+        get_discount_analysis: "DiscountAnalysis",
+    }
+
+    def check():
+        for report, table in reports.items():
+            report(db_file, incremental=True)
+            refreshed = sorted(fetch_data_from_db_file(db_file, f"SELECT * FROM {table}"), key=repr)
+            report(db_file)
+            rebuilt = sorted(fetch_data_from_db_file(db_file, f"SELECT * FROM {table}"), key=repr)
+            assert refreshed == rebuilt, table
+
+    def add(query, params):
+        with sqlite3.connect(db_file) as conn:
+            conn.execute(query, params)
+
+    try:
+        check()
+        check()  # Nothing new
+        max_detail = fetch_data_from_db_file(db_file, "SELECT MAX(order_detail_id) FROM OrderDetails")[0][0]
+        max_order = fetch_data_from_db_file(db_file, "SELECT MAX(order_id) FROM Orders")[0][0]
+        customer, product = fetch_data_from_db_file(
+            db_file, "SELECT (SELECT MIN(customer_id) FROM Customers), (SELECT MIN(product_id) FROM Products)")[0]
+        # A recent order with details, and one whose details only arrive after a refresh
+        add("INSERT INTO Orders (order_id, customer_id, order_date, status) VALUES (?, ?, date('now'), 'Pending')",
+            (max_order + 1, customer))
+        add("INSERT INTO Orders (order_id, customer_id, order_date, status) VALUES (?, ?, date('now'), 'Pending')",
+            (max_order + 2, customer))
+        add("INSERT INTO OrderDetails VALUES (?, ?, ?, 7, 123.45)", (max_detail + 1, max_order + 1, product))
+        check()
+        add("INSERT INTO OrderDetails VALUES (?, ?, ?, 3, 50)", (max_detail + 2, max_order + 2, product))
+        add("INSERT INTO OrderDetails VALUES (?, ?, ?, 2, 20)", (max_detail + 3, max_order + 2, product))
+        check()
+        # Rows inserted without their SERIAL id, which SQLite leaves NULL
+        add("INSERT INTO Orders (customer_id, order_date, status) VALUES (?, date('now'), 'Pending')", (customer,))
+        add("INSERT INTO OrderDetails (order_id, product_id, quantity, total_price) VALUES (?, ?, 1000, 5)",
+            (max_order + 1, product))
+        check()
+
+        totals = fetch_data_from_db_file(db_file, "SELECT COUNT(*) FROM TopSellingProductsTotals")[0][0]
+        solution.reset_incremental_reports(db_file)
+        tables = {name for name, in fetch_data_from_db_file(db_file, "SELECT name FROM sqlite_master")}
+        assert totals > 0 and not tables & set(solution.INCREMENTAL_TABLES)
+        check()
+    finally:
+        solution.pool.close()
+
+
+# --------------------------- #
+#  Test: Atomic Refresh
+# --------------------------- #
+
+
+def test_readers_see_the_previous_reports_until_a_refresh_commits(tmp_path):
+    db_file = str(tmp_path / "erp.db")
+    shutil.copy(DB_FILE, db_file)
+    tables = ["TopSellingProducts", "CustomerSalesPerformance", "SalesForecast", "DiscountAnalysis"]
+    try:
+        solution.refresh_reports(db_file)
+        before = {table: fetch_data_from_db_file(db_file, f"SELECT * FROM {table}") for table in tables}
+        assert all(before.values())
+
+        # A refresh failing midway leaves every report table as it was
+        with pytest.raises(sqlite3.OperationalError):
+            with solution.pool.transaction(db_file):
+                solution.execute_query(db_file, "DELETE FROM Products")
+                get_top_selling_products(db_file)
+                get_discount_analysis(db_file)
+                # Another connection reads the committed tables meanwhile
+                assert fetch_data_from_db_file(db_file, "SELECT * FROM TopSellingProducts") == before[tables[0]]
+                solution.execute_query(db_file, "SELECT * FROM NoSuchTable")
+        assert {table: fetch_data_from_db_file(db_file, f"SELECT * FROM {table}") for table in tables} == before
+
+        # Refreshes from several threads queue for the write lock rather than failing
+        errors = []
+
+        def refresh():
+            try:
+                solution.refresh_reports(db_file, incremental=True)
+            except sqlite3.Error as e:
+                errors.append(e)
+            finally:
+                solution.pool.close()
+
+        threads = [threading.Thread(target=refresh) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        assert fetch_data_from_db_file(db_file, "SELECT * FROM SalesForecast") == before["SalesForecast"]
+    finally:
+        solution.pool.close()
+
+
+# --------------------------- #
+#  Test: Parallel Report Runner
+# --------------------------- #
+
+
+def test_run_reports_builds_every_report_concurrently(tmp_path):
+    db_file, sequential_db = str(tmp_path / "erp.db"), str(tmp_path / "sequential.db")
+    shutil.copy(DB_FILE, db_file)
+    shutil.copy(DB_FILE, sequential_db)
+    try:
+        results = solution.run_reports(db_file)
+        solution.refresh_reports(sequential_db)
+
+        assert set(results) == {report.__name__ for report in solution.REPORT_TABLES} | {"get_late_deliveries"}
+        assert results["get_late_deliveries"][0] == get_late_deliveries(sequential_db)
+        assert all(built >= 0 and copied >= 0 for _, built, copied in results.values())
+        for table in solution.REPORT_TABLES.values():
+            query = f"SELECT * FROM {table}"
+            assert fetch_data_from_db_file(db_file, query) == fetch_data_from_db_file(sequential_db, query)
+            schema = f"SELECT sql FROM sqlite_master WHERE name = '{table}'"
+            assert fetch_data_from_db_file(db_file, schema) == fetch_data_from_db_file(sequential_db, schema)
+    finally:
+        solution.pool.close()